@@ -28,13 +28,23 @@ from mo_times.durations import MINUTE
 
 DEBUG = True
 QUERY_TOO_LARGE = "Query is too large"
+QUERY_TOO_EXPENSIVE = "Query is too expensive"
+TOO_MANY_QUERIES = "Too many queries"
 
 
-def send_error(active_data_timer, body, e):
-    status = 400
+def error_status(e):
+    """
+    :return: HTTP STATUS FOR THE Except e
+    """
+    if QUERY_TOO_LARGE in e or QUERY_TOO_EXPENSIVE in e:
+        return 413
+    elif TOO_MANY_QUERIES in e:
+        return 429
+    return 400
 
-    if QUERY_TOO_LARGE in e:
-        status = 413
+
+def send_error(active_data_timer, body, e):
+    status = error_status(e)
 
     record_request(flask.request, None, body, e)
     Log.warning("Could not process\n{{body}}", body=body.decode("latin1"), cause=e)
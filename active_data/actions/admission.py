@@ -0,0 +1,288 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import, division, unicode_literals
+
+from contextlib import contextmanager
+
+import flask
+
+from active_data.actions import QUERY_TOO_EXPENSIVE, TOO_MANY_QUERIES
+from jx_base.expressions import AndOp, EqOp, InOp, OrOp, TRUE, Variable, is_literal
+from jx_base.language import is_op
+from jx_base.query import QueryOp
+from jx_elasticsearch.es52 import ES52
+from mo_dots import Data, listwrap
+from mo_json import STRUCT
+from mo_json.typed_encoder import untype_path
+from mo_kwargs import override
+from mo_logs import Log
+from mo_threads import Lock, Till
+
+DEBUG = False
+UNKNOWN_CARDINALITY = 1000  # ASSUMED NUMBER OF PARTS FOR A COLUMN WITH NO METADATA YET
+UNKNOWN_SELECTIVITY = 0.5  # ASSUMED FRACTION OF DOCUMENTS A FILTER WE CAN NOT REASON ABOUT WILL MATCH
+
+controller = None  # SET BY setup(), None MEANS EVERY QUERY IS ADMITTED
+
+
+@override
+def setup(
+    max_cost=10 * 1000 * 1000,  # ESTIMATED CELLS (BUCKETS OR ROWS, TIMES SELECTS) ABOVE WHICH A QUERY IS REJECTED (413)
+    per_client=3,  # QUERIES ONE CLIENT CAN HAVE RUNNING AT ONCE
+    total=20,  # QUERIES ALL CLIENTS CAN HAVE RUNNING AT ONCE
+    max_waiting=100,  # QUERIES ALLOWED TO WAIT FOR A SLOT; MORE ARE REJECTED (429)
+    wait=30,  # SECONDS A QUERY WILL WAIT FOR A SLOT BEFORE IT IS REJECTED (429)
+    trusted_proxies=1,  # NUMBER OF PROXIES IN FRONT OF THIS SERVICE THAT ADD TO X-Forwarded-For
+    enabled=True,
+    kwargs=None
+):
+    global controller
+    if enabled:
+        controller = AdmissionController(kwargs=kwargs)
+    else:
+        controller = None
+
+
+@contextmanager
+def admit(query, frum):
+    """
+    HOLD A SLOT WHILE THE query RUNS, OR RAISE QUERY_TOO_EXPENSIVE/TOO_MANY_QUERIES
+    :return: THE COST ESTIMATE (None IF NOT ESTIMATED)
+    """
+    if controller is None:
+        yield None
+        return
+    estimate = estimate_cost(query, frum)
+    with controller.slot(controller.client(), estimate):
+        yield estimate
+
+
+@contextmanager
+def admit_batch(num):
+    """
+    HOLD ONE SLOT FOR EACH OF THE num QUERIES OF A BATCH THAT MAY RUN AT ONCE,
+    UP TO per_client.  EACH QUERY IN THE BATCH IS STILL SUBJECT TO check_cost()
+    :return: THE NUMBER OF THE BATCH'S QUERIES THAT MAY RUN AT ONCE
+    """
+    if controller is None:
+        yield num
+        return
+    concurrency = max(1, min(num, controller.per_client, controller.total))
+    with controller.slot(controller.client(), None, concurrency):
+        yield concurrency
+
+
+def check_cost(query, frum):
+    """
+    RAISE QUERY_TOO_EXPENSIVE IF query IS TOO EXPENSIVE, WITHOUT TAKING A SLOT
+    :return: THE COST ESTIMATE (None IF NOT ESTIMATED)
+    """
+    if controller is None:
+        return None
+    estimate = estimate_cost(query, frum)
+    controller.check(estimate)
+    return estimate
+
+
+def client_id(forwarded, remote_addr, trusted_proxies):
+    """
+    EACH PROXY APPENDS THE ADDRESS IT GOT THE REQUEST FROM TO X-Forwarded-For;
+    THE ENTRIES BEFORE THOSE ARE WHATEVER THE CLIENT SENT
+    :param forwarded: THE X-Forwarded-For HEADER (None IF MISSING)
+    :param remote_addr: THE ADDRESS THAT CONNECTED TO THIS SERVICE
+    :param trusted_proxies: NUMBER OF PROXIES IN FRONT OF THIS SERVICE
+    :return: THE REQUESTER, AS SEEN BY THE OUTERMOST TRUSTED PROXY
+    """
+    if trusted_proxies and forwarded:
+        addresses = [a.strip() for a in forwarded.split(",")]
+        if len(addresses) >= trusted_proxies:
+            return addresses[-trusted_proxies]
+    return remote_addr
+
+
+class AdmissionController(object):
+    """
+    LIMIT THE QUERIES RUNNING, PER CLIENT AND IN TOTAL.  QUERIES THAT MUST
+    WAIT ARE QUEUED, FOR A WHILE.  QUERIES THAT ARE TOO EXPENSIVE ARE
+    REJECTED BEFORE THEY ARE SENT TO ES
+    """
+
+    @override
+    def __init__(self, max_cost, per_client, total, max_waiting, wait, trusted_proxies=1, kwargs=None):
+        self.max_cost = max_cost
+        self.per_client = per_client
+        self.total = total
+        self.max_waiting = max_waiting
+        self.wait = wait
+        self.trusted_proxies = trusted_proxies
+        self.locker = Lock("admission")
+        self.running = {}  # MAP FROM CLIENT TO NUMBER OF QUERIES RUNNING
+        self.num_running = 0
+        self.num_waiting = 0
+        self.rejected = Data(expensive=0, busy=0)
+
+    def client(self):
+        return client_id(flask.request.headers.get("X-Forwarded-For"), flask.request.remote_addr, self.trusted_proxies)
+
+    def check(self, estimate):
+        if estimate is not None and estimate.cost > self.max_cost:
+            with self.locker:
+                self.rejected.expensive += 1
+            Log.error(
+                QUERY_TOO_EXPENSIVE + " (estimated {{estimate.cost}} cells, limit is {{limit}})",
+                estimate=estimate,
+                limit=self.max_cost
+            )
+
+    @contextmanager
+    def slot(self, client, estimate, num=1):
+        """
+        HOLD num SLOTS FOR client
+        """
+        self.check(estimate)
+
+        timeout = Till(seconds=self.wait)
+        with self.locker:
+            if self._full(client, num) and self.num_waiting >= self.max_waiting:
+                self.rejected.busy += 1
+                Log.error(TOO_MANY_QUERIES + " ({{num}} waiting)", num=self.num_waiting, estimate=estimate)
+            self.num_waiting += 1
+            try:
+                while self._full(client, num):
+                    if timeout:
+                        self.rejected.busy += 1
+                        Log.error(
+                            TOO_MANY_QUERIES + " ({{client}} has {{num}} running)",
+                            client=client,
+                            num=self.running.get(client, 0),
+                            estimate=estimate
+                        )
+                    # Lock ONLY WAKES ONE WAITER; DO NOT DEPEND ON IT
+                    self.locker.wait(till=Till(seconds=1) | timeout)
+            finally:
+                self.num_waiting -= 1
+            self.num_running += num
+            self.running[client] = self.running.get(client, 0) + num
+
+        try:
+            yield
+        finally:
+            with self.locker:
+                self.num_running -= num
+                remaining = self.running[client] - num
+                if remaining:
+                    self.running[client] = remaining
+                else:
+                    del self.running[client]
+
+    def _full(self, client, num):
+        return self.num_running + num > self.total or self.running.get(client, 0) + num > self.per_client
+
+    @property
+    def stats(self):
+        with self.locker:
+            return Data(
+                running=self.num_running,
+                waiting=self.num_waiting,
+                clients=len(self.running),
+                rejected=self.rejected.copy()
+            )
+
+
+def estimate_cost(query, frum):
+    """
+    ESTIMATE THE WORK A QUERY WILL CAUSE, FROM THE COLUMN METADATA
+    :return: Data WITH hits (DOCUMENTS MATCHED), buckets (AGGREGATE CELLS), rows (RETURNED), AND cost
+    """
+    if not isinstance(frum, ES52):
+        return None
+    try:
+        query = QueryOp.wrap(query, container=frum, namespace=frum.namespace)
+        columns = {}
+        for c in frum.snowflake.columns:
+            if c.jx_type not in STRUCT:
+                columns.setdefault(untype_path(c.name), []).append(c)
+
+        output = _estimate(query, columns, query.frum.schema.query_path[0])
+        DEBUG and Log.note("estimate {{estimate|json}}", estimate=output)
+        return output
+    except Exception as e:
+        # NO ESTIMATE IS NO REASON TO REFUSE THE QUERY
+        Log.warning("Can not estimate query cost", cause=e)
+        return None
+
+
+def _estimate(query, columns, query_path):
+    """
+    :param query: NORMALIZED QUERY
+    :param columns: MAP FROM (UNTYPED) NAME TO LIST OF COLUMNS
+    :param query_path: THE NESTED PATH OF THE DOCUMENTS THE QUERY RETURNS
+    """
+    total = max([c.count for cs in columns.values() for c in cs if c.count] or [0])
+    hits = total * _selectivity(query.where, columns)
+
+    selects = len(listwrap(query.select)) or 1
+    if query.edges or query.groupby:
+        buckets = 1
+        for e in listwrap(query.edges) + listwrap(query.groupby):
+            buckets *= _num_parts(e, columns)
+        if query.groupby:
+            # ONLY COMBINATIONS THAT EXIST ARE RETURNED
+            buckets = min(buckets, max(hits, 1))
+        rows = min(buckets, query.limit) if query.limit else buckets
+    elif any(s.aggregate not in (None, "none") for s in listwrap(query.select)):
+        buckets = rows = 1
+    else:
+        buckets = 0
+        rows = min(query.limit, hits) if query.limit else hits
+        rows *= max([c.multi or 1 for cs in columns.values() for c in cs if c.nested_path[0] == query_path] or [1])
+
+    return Data(hits=int(hits), buckets=int(buckets), rows=int(rows), cost=int(max(buckets, rows) * selects))
+
+
+def _num_parts(edge, columns):
+    domain = edge.domain
+    if domain.type in ("set", "time", "duration", "range") and domain.partitions:
+        return len(domain.partitions) + 1  # PLUS THE null PART
+    parts = UNKNOWN_CARDINALITY
+    if is_op(edge.value, Variable):
+        cs = columns.get(untype_path(edge.value.var))
+        if cs:
+            parts = sum(c.cardinality if c.cardinality is not None else UNKNOWN_CARDINALITY for c in cs) + 1
+    if domain.type == "default" and domain.limit:
+        # ES RETURNS ONLY THE TOP limit PARTS
+        parts = min(parts, domain.limit + 1)
+    return parts
+
+
+def _selectivity(where, columns):
+    """
+    :return: FRACTION OF THE DOCUMENTS where WILL MATCH
+    """
+    if where is None or where is TRUE:
+        return 1
+    if is_op(where, AndOp):
+        output = 1
+        for t in where.terms:
+            output *= _selectivity(t, columns)
+        return output
+    if is_op(where, OrOp):
+        return min(1, sum(_selectivity(t, columns) for t in where.terms))
+    if is_op(where, EqOp) and is_op(where.lhs, Variable) and is_literal(where.rhs):
+        return 1 / _cardinality(where.lhs.var, columns)
+    if is_op(where, InOp) and is_op(where.value, Variable) and is_literal(where.superset):
+        return min(1, len(listwrap(where.superset.value)) / _cardinality(where.value.var, columns))
+    return UNKNOWN_SELECTIVITY
+
+
+def _cardinality(name, columns):
+    cs = columns.get(untype_path(name))
+    if not cs:
+        return UNKNOWN_CARDINALITY
+    return max(max(c.cardinality or 1 for c in cs), 1)
@@ -0,0 +1,178 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import flask
+from flask import Response
+
+from active_data import record_request
+from active_data.actions import QUERY_TOO_LARGE, admission, error_status, find_container, result_cache, save_query, send_error, test_mode_wait
+from active_data.actions.query import BLANK, QUERY_SIZE_LIMIT
+from jx_base.container import Container
+from jx_elasticsearch.multisearch import MultiSearch
+from jx_python import jx
+from mo_dots import Data, is_list
+from mo_future import text_type
+from mo_json import json2value, value2utf8
+from mo_logs import Except, Log
+from mo_logs.strings import utf82unicode
+import mo_math
+from mo_threads.threads import RegisterThread
+from mo_times.timer import Timer
+from pyLibrary.env.flask_wrappers import cors_wrapper
+
+BATCH_SIZE_LIMIT = 100  # MAXIMUM NUMBER OF QUERIES IN ONE BATCH
+
+
+@cors_wrapper
+def jx_batch_query(path):
+    """
+    RUN A LIST OF JX QUERIES.  THEY ARE TRANSLATED CONCURRENTLY, AS MANY AT
+    ONCE AS THE CLIENT HAS ADMISSION SLOTS FOR, AND THEIR ES SEARCHES ARE
+    SENT AS ONE _msearch.  THE RESPONSE HAS ONE RESULT (OR
+    ERROR) PER QUERY, IN ORDER
+    """
+    with RegisterThread():
+        request_body = b""
+        try:
+            with Timer("total duration") as query_timer:
+                preamble_timer = Timer("preamble", silent=True)
+                with preamble_timer:
+                    if flask.request.headers.get("content-length", "") in ["", "0"]:
+                        # ASSUME A BROWSER HIT THIS POINT, SEND text/html RESPONSE BACK
+                        return Response(
+                            BLANK,
+                            status=400,
+                            headers={
+                                "Content-Type": "text/html"
+                            }
+                        )
+                    elif int(flask.request.headers["content-length"]) > QUERY_SIZE_LIMIT:
+                        Log.error(QUERY_TOO_LARGE)
+
+                    request_body = flask.request.get_data().strip()
+                    text = utf82unicode(request_body)
+                    queries = json2value(text)
+                    if not is_list(queries):
+                        Log.error("Expecting a list of queries")
+                    elif len(queries) > BATCH_SIZE_LIMIT:
+                        Log.error(QUERY_TOO_LARGE + " ({{num}} queries, limit is {{limit}})", num=len(queries), limit=BATCH_SIZE_LIMIT)
+                    record_request(flask.request, queries, None, None)
+
+                batch = MultiSearch("batch query")
+                with admission.admit_batch(len(queries)) as concurrency:
+                    # NO MORE THAN concurrency QUERIES RUN AT ONCE; EACH GROUP SENDS ITS OWN _msearch
+                    for start in range(0, len(queries), concurrency):
+                        for i in range(start, min(start + concurrency, len(queries))):
+                            batch.run("batch query " + text_type(i), _run_one, queries[i])
+                        batch.wait()
+                    members = batch.wait()
+
+                with Timer("jsonification", silent=True) as json_timer:
+                    results = []
+                    for data, member in zip(queries, members):
+                        if member.error:
+                            results.append(_error_data(data, member))
+                        else:
+                            results.append(_response_data(member))
+
+            meta = {"timing": {
+                "preamble": mo_math.round(preamble_timer.duration.seconds, digits=4),
+                "jsonification": mo_math.round(json_timer.duration.seconds, digits=4),
+                "total": mo_math.round(query_timer.duration.seconds, digits=4),
+                "msearch": batch.stats.requests,
+                "searches": batch.stats.searches
+            }}
+            response_data = b'{"data":[' + b",\n".join(results) + b'],"meta":' + value2utf8(meta) + b'}'
+            Log.note("Batch of {{num}} queries is {{bytes}} bytes in {{duration}}", num=len(queries), bytes=len(response_data), duration=query_timer.duration)
+
+            return Response(
+                response_data,
+                status=200,
+                headers={
+                    "Content-Type": "application/json"
+                }
+            )
+        except Exception as e:
+            e = Except.wrap(e)
+            return send_error(query_timer, request_body, e)
+
+
+def _run_one(data):
+    """
+    RUN ONE QUERY OF THE BATCH, ON ITS OWN THREAD
+    :return: Data WITH THE JSON response_data, AND THE cache STATUS
+    """
+    if data.meta.stream or data.format == "ndjson":
+        Log.error("Streaming is not supported in a batch")
+    if data.meta.testing:
+        test_mode_wait(data)
+
+    translate_timer = Timer("translate", silent=True)
+    with translate_timer:
+        frum = find_container(data['from'])
+        cache_key, query = result_cache.get_key(data, frum, endpoint="batch")
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            # CACHED RESPONSE STILL HAS THE TIMING OF THE ORIGINAL QUERY, EXCEPT total
+            _, response_data = cached
+            return Data(response_data=response_data, cache="hit")
+
+        estimate = admission.check_cost(query, frum)
+        result = jx.run(query, container=frum)
+        if isinstance(result, Container):  #TODO: REMOVE THIS CHECK, jx SHOULD ALWAYS RETURN Containers
+            result = result.format(data.format)
+
+    save_timer = Timer("save")
+    with save_timer:
+        if data.meta.save:
+            try:
+                result.meta.saved_as = save_query.query_finder.save(data)
+            except Exception as e:
+                Log.warning("Unexpected save problem", cause=e)
+
+    result.meta.timing.translate = mo_math.round(translate_timer.duration.seconds, digits=4)
+    result.meta.timing.save = mo_math.round(save_timer.duration.seconds, digits=4)
+    if estimate is not None:
+        result.meta.estimate = estimate
+    result.meta.timing.total = "{{TOTAL_TIME}}"  # TIMING PLACEHOLDER
+
+    response_data = value2utf8(result)
+    result_cache.put(cache_key, (result.meta.content_type, response_data))
+    return Data(response_data=response_data, cache="miss" if cache_key is not None else None)
+
+
+def _response_data(member):
+    """
+    :return: THE JSON FOR ONE QUERY, WITH ITS OWN TIMING FILLED IN
+    """
+    response = member.response
+    timing_replacement = (
+        b'"total":' + value2utf8(mo_math.round(member.duration, digits=4)) +
+        b', "msearch":' + value2utf8(mo_math.round(member.waiting, digits=4)) +
+        b', "searches":' + value2utf8(member.searches)
+    )
+    if response.cache:
+        timing_replacement += b', "cache":' + (b'"hit"' if response.cache == "hit" else b'"miss"')
+    return response.response_data.replace(b'"total":"{{TOTAL_TIME}}"', timing_replacement)
+
+
+def _error_data(data, member):
+    """
+    :return: THE JSON FOR ONE QUERY THAT FAILED; SAME AS /query WOULD SEND, PLUS ITS status
+    """
+    e = member.error
+    record_request(flask.request, data, None, e)
+    Log.warning("Could not process batch query", cause=e)
+    output = e.__data__()
+    output.status = error_status(e)
+    output.meta.timing.total = mo_math.round(member.duration, digits=4)
+    output.meta.timing.msearch = mo_math.round(member.waiting, digits=4)
+    output.meta.timing.searches = member.searches
+    return value2utf8(output)
@@ -12,12 +12,12 @@ import flask
 from flask import Response
 
 from active_data import record_request
-from active_data.actions import QUERY_TOO_LARGE, find_container, save_query, send_error, test_mode_wait
+from active_data.actions import QUERY_TOO_LARGE, admission, find_container, result_cache, save_query, send_error, test_mode_wait
 from jx_base.container import Container
 from jx_python import jx
 from mo_files import File
 from mo_future import binary_type
-from mo_json import json2value, value2json
+from mo_json import json2value, value2utf8
 from mo_logs import Except, Log
 from mo_logs.strings import unicode2utf8, utf82unicode
 import mo_math
@@ -27,11 +27,14 @@ from pyLibrary.env.flask_wrappers import cors_wrapper
 
 BLANK = unicode2utf8(File("active_data/public/error.html").read())
 QUERY_SIZE_LIMIT = 10*1024*1024
+STREAM_FORMATS = ["list", "table", "ndjson"]  # FORMATS THAT CAN BE SENT AS THEY ARE PRODUCED
+STREAM_CHUNK_SIZE = 32*1024  # BYTES TO ACCUMULATE BEFORE SENDING A CHUNK
 
 
 @cors_wrapper
 def jx_query(path):
     with RegisterThread():
+        slot = None  # ADMISSION SLOT, HELD WHILE THE QUERY IS SENT TO ES
         try:
             with Timer("total duration") as query_timer:
                 preamble_timer = Timer("preamble", silent=True)
@@ -58,34 +61,70 @@ def jx_query(path):
                 translate_timer = Timer("translate", silent=True)
                 with translate_timer:
                     frum = find_container(data['from'])
-                    result = jx.run(data, container=frum)
+                    cache_key, query = result_cache.get_key(data, frum)
+                    cached = result_cache.get(cache_key)
+                    if cached is None:
+                        stream = (data.meta.stream or data.format == "ndjson") and data.format in STREAM_FORMATS
+                        admitted = admission.admit(query, frum)
+                        estimate = admitted.__enter__()
+                        slot = admitted
+                        result = jx.run(query, container=frum)
+                        if not stream:
+                            slot = _release(slot)
 
-                    if isinstance(result, Container):  #TODO: REMOVE THIS CHECK, jx SHOULD ALWAYS RETURN Containers
-                        result = result.format(data.format)
+                        if isinstance(result, Container):  #TODO: REMOVE THIS CHECK, jx SHOULD ALWAYS RETURN Containers
+                            result = result.format(data.format)
 
-                save_timer = Timer("save")
-                with save_timer:
-                    if data.meta.save:
-                        try:
-                            result.meta.saved_as = save_query.query_finder.save(data)
-                        except Exception as e:
-                            Log.warning("Unexpected save problem", cause=e)
+                if cached is None:
+                    save_timer = Timer("save")
+                    with save_timer:
+                        if data.meta.save:
+                            try:
+                                result.meta.saved_as = save_query.query_finder.save(data)
+                            except Exception as e:
+                                Log.warning("Unexpected save problem", cause=e)
 
-                result.meta.timing.preamble = mo_math.round(preamble_timer.duration.seconds, digits=4)
-                result.meta.timing.translate = mo_math.round(translate_timer.duration.seconds, digits=4)
-                result.meta.timing.save = mo_math.round(save_timer.duration.seconds, digits=4)
-                result.meta.timing.total = "{{TOTAL_TIME}}"  # TIMING PLACEHOLDER
+                    result.meta.timing.preamble = mo_math.round(preamble_timer.duration.seconds, digits=4)
+                    result.meta.timing.translate = mo_math.round(translate_timer.duration.seconds, digits=4)
+                    result.meta.timing.save = mo_math.round(save_timer.duration.seconds, digits=4)
+                    if estimate is not None:
+                        result.meta.estimate = estimate
 
-                with Timer("jsonification", silent=True) as json_timer:
-                    response_data = unicode2utf8(value2json(result))
+                    if stream:
+                        # ROWS ARE PULLED FROM ES, FORMATTED, AND SENT WHILE THE RESPONSE IS WRITTEN,
+                        # SO THE SLOT IS RELEASED WHEN THE RESPONSE IS CLOSED, NOT NOW
+                        response = Response(
+                            stream_response(result, data.format, query_timer),
+                            status=200,
+                            headers={
+                                "Content-Type": result.meta.content_type
+                            }
+                        )
+                        response.call_on_close(lambda slot=slot: _release(slot))
+                        slot = None
+                        return response
+
+                    result.meta.timing.total = "{{TOTAL_TIME}}"  # TIMING PLACEHOLDER
+
+                    with Timer("jsonification", silent=True) as json_timer:
+                        response_data = value2utf8(result)
+                    content_type = result.meta.content_type
+                    result_cache.put(cache_key, (content_type, response_data))
+                    json_duration = json_timer.duration.seconds
+                else:
+                    # CACHED RESPONSE STILL HAS THE TIMING OF THE ORIGINAL QUERY, EXCEPT total
+                    content_type, response_data = cached
+                    json_duration = 0
 
             with Timer("post timer", silent=True):
                 # IMPORTANT: WE WANT TO TIME OF THE JSON SERIALIZATION, AND HAVE IT IN THE JSON ITSELF.
                 # WE CHEAT BY DOING A (HOPEFULLY FAST) STRING REPLACEMENT AT THE VERY END
                 timing_replacement = (
                     b'"total":' + binary_type(mo_math.round(query_timer.duration.seconds, digits=4)) +
-                    b', "jsonification":' + binary_type(mo_math.round(json_timer.duration.seconds, digits=4))
+                    b', "jsonification":' + binary_type(mo_math.round(json_duration, digits=4))
                 )
+                if cache_key is not None:
+                    timing_replacement += b', "cache":' + (b'"miss"' if cached is None else b'"hit"')
                 response_data = response_data.replace(b'"total":"{{TOTAL_TIME}}"', timing_replacement)
                 Log.note("Response is {{num}} bytes in {{duration}}", num=len(response_data), duration=query_timer.duration)
 
@@ -93,11 +132,76 @@ def jx_query(path):
                     response_data,
                     status=200,
                     headers={
-                        "Content-Type": result.meta.content_type
+                        "Content-Type": content_type
                     }
                 )
         except Exception as e:
             e = Except.wrap(e)
             return send_error(query_timer, request_body, e)
+        finally:
+            _release(slot)
+
+
+def _release(slot):
+    """
+    GIVE BACK THE ADMISSION SLOT (FROM admission.admit())
+    :return: None
+    """
+    if slot is not None:
+        slot.__exit__(None, None, None)
+    return None
+
+
+def stream_response(result, format, query_timer):
+    """
+    GENERATE THE RESPONSE BYTES, IN CHUNKS, AS THE ROWS ARE PRODUCED
+    THE meta (WITH TIMING, AND ANY ERROR) IS SENT LAST, AFTER ALL ROWS
+
+    THE 200 STATUS IS SENT WITH THE FIRST CHUNK, SO AN ERROR WHILE PAGING CAN
+    NOT CHANGE IT: THE ROWS SENT SO FAR ARE FOLLOWED BY meta.error.  CLIENTS OF
+    A STREAMED RESPONSE MUST CHECK meta.error BEFORE TRUSTING THE ROWS
+    :param result: FORMATTED RESULT, WITH data THAT CAN BE ITERATED (ONCE)
+    :param format: ONE OF STREAM_FORMATS
+    :param query_timer: TIMER FOR THE WORK DONE BEFORE STREAMING STARTED
+    """
+    with RegisterThread():
+        meta = result.meta
+        if format == "ndjson":
+            acc = []
+            separator, end = b"", b"\n"
+        elif format == "table":
+            acc = [b'{"header":', value2utf8(result.header), b',"data":[']
+            separator, end = b",\n", b""
+        else:
+            acc = [b'{"data":[']
+            separator, end = b",\n", b""
 
+        with Timer("stream", silent=True) as stream_timer:
+            num_rows = 0
+            size = 0
+            try:
+                for row in result.data:
+                    line = value2utf8(row)
+                    if num_rows:
+                        acc.append(separator)
+                    acc.append(line)
+                    acc.append(end)
+                    num_rows += 1
+                    size += len(line)
+                    if size > STREAM_CHUNK_SIZE:
+                        yield b"".join(acc)
+                        acc = []
+                        size = 0
+            except Exception as e:
+                e = Except.wrap(e)
+                Log.warning("Problem streaming response", cause=e)
+                meta.error = e.__data__()
 
+        meta.timing.stream = mo_math.round(stream_timer.duration.seconds, digits=4)
+        meta.timing.total = mo_math.round(query_timer.duration.seconds + stream_timer.duration.seconds, digits=4)
+        if format == "ndjson":
+            acc.append(value2utf8({"meta": meta}) + b"\n")
+        else:
+            acc.append(b'],"meta":' + value2utf8(meta) + b'}')
+        yield b"".join(acc)
+        Log.note("Streamed {{num}} rows in {{duration}}", num=num_rows, duration=stream_timer.duration)
@@ -0,0 +1,97 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_base.query import QueryOp
+from jx_elasticsearch.es52 import ES52
+from mo_collections.lru import LruCache
+from mo_dots import coalesce
+from mo_json import value2json
+from mo_kwargs import override
+from mo_logs import Log
+
+DEBUG = False
+
+cache = None  # SET BY setup(), None MEANS NO CACHING
+
+
+@override
+def setup(
+    max_size=100 * 1024 * 1024,  # BYTES OF RESPONSES TO KEEP
+    ttl=60,  # SECONDS A RESPONSE IS GOOD FOR; ES DOES NOT TELL US WHEN NEW DOCUMENTS ARRIVE
+    enabled=False,  # OFF UNLESS CONFIGURED: CLIENTS GET RESPONSES UP TO ttl OLD
+    kwargs=None
+):
+    global cache
+    if enabled:
+        cache = LruCache(max_size=max_size, ttl=ttl, size=_size, name="result cache")
+    else:
+        cache = None
+
+
+def get_key(query, frum, meta=None, endpoint="query"):
+    """
+    :param query: THE JX QUERY (AS GIVEN BY THE CLIENT)
+    :param frum: THE CONTAINER THE QUERY IS RUN AGAINST
+    :param meta: THE REQUEST meta, IF NOT query.meta
+    :param endpoint: NAME OF THE ENDPOINT; EACH FORMATS ITS RESPONSE DIFFERENTLY, SO HAS ITS OWN KEYS
+    :return: (key, query) PAIR; key IS None IF THE RESULT SHOULD NOT BE CACHED, query MAY BE NORMALIZED
+    """
+    if cache is None:
+        return None, query
+    meta = coalesce(meta, query.meta)
+    if meta.cache is False or meta.save or meta.testing:
+        return None, query
+    if not isinstance(frum, ES52):
+        # ONLY ES HAS A METADATA WATERMARK WE CAN KEY ON
+        return None, query
+
+    try:
+        query_op = QueryOp.wrap(query, container=frum, namespace=frum.namespace)
+        if query_op.stream:
+            # STREAMED RESPONSES ARE NEVER WHOLE IN MEMORY
+            return None, query_op
+        watermark = frum.es.cluster.get_last_updated(frum.es.settings.index)
+        key = endpoint + ":" + value2json({
+            "from": frum.name,
+            "select": query_op.select,
+            "edges": query_op.edges,
+            "groupby": query_op.groupby,
+            "where": query_op.where,
+            "window": query_op.window,
+            "sort": query_op.sort,
+            "limit": query_op.limit,
+            "format": query_op.format,
+            "watermark": watermark
+        })
+        return key, query_op
+    except Exception as e:
+        Log.warning("Can not make cache key", cause=e)
+        return None, query
+
+
+def _size(value):
+    # value IS (content_type, response_data) PAIR
+    return len(value[1])
+
+
+def get(key):
+    if key is None:
+        return None
+    return cache.get(key)
+
+
+def put(key, value):
+    """
+    :param value: (content_type, response_data) PAIR
+    """
+    if key is None:
+        return
+    cache.set(key, value)
+    DEBUG and Log.note("cached {{num}} bytes", num=_size(value))
@@ -8,19 +8,24 @@
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import ast
+import re
+
 import flask
 from flask import Response
 
 from active_data import record_request
-from active_data.actions import find_container, save_query, send_error, test_mode_wait
+from active_data.actions import find_container, result_cache, save_query, send_error, test_mode_wait
 from active_data.actions.query import BLANK, QUERY_SIZE_LIMIT
 from jx_base.container import Container
 from jx_python import jx
-from mo_dots import is_data, is_list, listwrap, unwraplist, wrap
-from mo_json import json2value, utf82unicode, value2json
+from mo_collections.lru import LruCache
+from mo_dots import is_data, is_list, listwrap, unwrap, unwraplist, wrap
+from mo_future import is_text
+from mo_json import json2value, utf82unicode, value2utf8
 from mo_logs import Log
 from mo_logs.exceptions import Except
-from mo_logs.strings import unicode2utf8
+from mo_logs.strings import expand_template
 import mo_math
 from mo_testing.fuzzytestcase import assertAlmostEqual
 from mo_threads.threads import RegisterThread
@@ -59,36 +64,50 @@ def sql_query(path):
                 with translate_timer:
                     if not data.sql:
                         Log.error("Expecting a `sql` parameter")
-                    jx_query = parse_sql(data.sql)
+                    jx_query, parse_cache = cached_parse_sql(data.sql)
                     frum = find_container(jx_query['from'])
                     if data.meta.testing:
                         test_mode_wait(jx_query)
-                    result = jx.run(jx_query, container=frum)
-                    if isinstance(result, Container):  # TODO: REMOVE THIS CHECK, jx SHOULD ALWAYS RETURN Containers
-                        result = result.format(jx_query.format)
-                    result.meta.jx_query = jx_query
-
-                save_timer = Timer("save")
-                with save_timer:
-                    if data.meta.save:
-                        try:
-                            result.meta.saved_as = save_query.query_finder.save(data)
-                        except Exception as e:
-                            Log.warning("Unexpected save problem", cause=e)
-
-                result.meta.timing.preamble = mo_math.round(preamble_timer.duration.seconds, digits=4)
-                result.meta.timing.translate = mo_math.round(translate_timer.duration.seconds, digits=4)
-                result.meta.timing.save = mo_math.round(save_timer.duration.seconds, digits=4)
-                result.meta.timing.total = "{{TOTAL_TIME}}"  # TIMING PLACEHOLDER
-
-                with Timer("jsonification", silent=True) as json_timer:
-                    response_data = unicode2utf8(value2json(result))
+                    cache_key, query = result_cache.get_key(jx_query, frum, meta=data.meta, endpoint="sql")
+                    cached = result_cache.get(cache_key)
+                    if cached is None:
+                        result = jx.run(query, container=frum)
+                        if isinstance(result, Container):  # TODO: REMOVE THIS CHECK, jx SHOULD ALWAYS RETURN Containers
+                            result = result.format(jx_query.format)
+                        result.meta.jx_query = jx_query
+
+                if cached is None:
+                    save_timer = Timer("save")
+                    with save_timer:
+                        if data.meta.save:
+                            try:
+                                result.meta.saved_as = save_query.query_finder.save(data)
+                            except Exception as e:
+                                Log.warning("Unexpected save problem", cause=e)
+
+                    result.meta.timing.preamble = mo_math.round(preamble_timer.duration.seconds, digits=4)
+                    result.meta.timing.translate = mo_math.round(translate_timer.duration.seconds, digits=4)
+                    result.meta.timing.save = mo_math.round(save_timer.duration.seconds, digits=4)
+                    result.meta.timing.parse_cache = parse_cache
+                    result.meta.timing.total = "{{TOTAL_TIME}}"  # TIMING PLACEHOLDER
+
+                    with Timer("jsonification", silent=True) as json_timer:
+                        response_data = value2utf8(result)
+                    content_type = result.meta.content_type
+                    result_cache.put(cache_key, (content_type, response_data))
+                    json_duration = json_timer.duration.seconds
+                else:
+                    # CACHED RESPONSE STILL HAS THE TIMING OF THE ORIGINAL QUERY, EXCEPT total
+                    content_type, response_data = cached
+                    json_duration = 0
 
             with Timer("post timer", silent=True):
                 # IMPORTANT: WE WANT TO TIME OF THE JSON SERIALIZATION, AND HAVE IT IN THE JSON ITSELF.
                 # WE CHEAT BY DOING A (HOPEFULLY FAST) STRING REPLACEMENT AT THE VERY END
                 timing_replacement = b'"total": ' + str(mo_math.round(query_timer.duration.seconds, digits=4)) +\
-                                     b', "jsonification": ' + str(mo_math.round(json_timer.duration.seconds, digits=4))
+                                     b', "jsonification": ' + str(mo_math.round(json_duration, digits=4))
+                if cache_key is not None:
+                    timing_replacement += b', "cache": ' + (b'"miss"' if cached is None else b'"hit"')
                 response_data = response_data.replace(b'"total":"{{TOTAL_TIME}}"', timing_replacement)
                 Log.note("Response is {{num}} bytes in {{duration}}", num=len(response_data), duration=query_timer.duration)
 
@@ -96,7 +115,7 @@ def sql_query(path):
                     response_data,
                     status=200,
                     headers={
-                        "Content-Type": result.meta.content_type
+                        "Content-Type": content_type
                     }
                 )
         except Exception as e:
@@ -105,6 +124,77 @@ def sql_query(path):
 
 
 KNOWN_SQL_AGGREGATES = {"sum", "count", "avg", "median", "percentile"}
+SQL_CACHE_SIZE = 1000  # NUMBER OF TRANSLATED SQL STATEMENTS TO KEEP
+PARAMETERIZE_LITERALS = True  # STATEMENTS THAT DIFFER ONLY IN STRING LITERALS SHARE A PARSE
+SQL_STRING = re.compile(r"""(?P<string>'(?:''|\\.|[^'])*')|(?P<name>"(?:""|\\.|[^"])*")""")
+PLACEHOLDER = "__jx_literal_{{num}}__"
+
+parsed = LruCache(max_size=SQL_CACHE_SIZE, name="parsed sql")  # MAP FROM (PARAMETERIZED) SQL TO JX QUERY
+
+
+def cached_parse_sql(sql):
+    """
+    moz_sql_parser IS SLOW, SO KEEP THE TRANSLATION OF EACH STATEMENT SHAPE
+    :return: (jx_query, "hit"/"miss") PAIR; jx_query IS A NEW COPY, OK TO MARK UP
+    """
+    template, literals = parameterize(sql) if PARAMETERIZE_LITERALS else (sql, {})
+    translated = parsed.get(template)
+    if translated is not None:
+        return wrap(_substitute(translated, literals)), "hit"
+
+    try:
+        translated = unwrap(parse_sql(template))
+    except Exception:
+        if not literals:
+            raise
+        # SOME LITERALS CAN NOT BE PLACEHOLDERS; CACHE THE WHOLE STATEMENT
+        template, literals = sql, {}
+        translated = parsed.get(template)
+        if translated is not None:
+            return wrap(_substitute(translated, literals)), "hit"
+        translated = unwrap(parse_sql(template))
+    parsed.set(template, translated)
+    return wrap(_substitute(translated, literals)), "miss"
+
+
+def parameterize(sql):
+    """
+    :return: (template, literals) PAIR; template HAS THE STRING LITERALS OF sql
+             REPLACED WITH PLACEHOLDERS, literals MAPS PLACEHOLDER TO VALUE
+    """
+    placeholders = {}  # MAP FROM SQL LITERAL TO PLACEHOLDER; SAME LITERAL, SAME PLACEHOLDER
+    literals = {}
+
+    def replace(match):
+        token = match.group("string")
+        if token is None:
+            return match.group(0)
+        placeholder = placeholders.get(token)
+        if placeholder is None:
+            placeholder = placeholders[token] = expand_template(PLACEHOLDER, {"num": len(placeholders)})
+            if placeholder in sql:
+                Log.error("placeholder {{placeholder}} found in sql", placeholder=placeholder)
+            literals[placeholder] = ast.literal_eval("'" + token[1:-1].replace("''", "\\'") + "'")
+        return "'" + placeholder + "'"
+
+    try:
+        return SQL_STRING.sub(replace, sql), literals
+    except Exception:
+        return sql, {}
+
+
+def _substitute(value, literals):
+    """
+    :return: COPY OF value, WITH THE PLACEHOLDERS REPLACED BY THEIR LITERALS
+    """
+    if is_text(value):
+        return literals.get(value, value)
+    elif isinstance(value, dict):
+        return {k: _substitute(v, literals) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_substitute(v, literals) for v in value]
+    else:
+        return value
 
 
 def parse_sql(sql):
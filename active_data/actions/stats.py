@@ -0,0 +1,63 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import, division, unicode_literals
+
+from werkzeug.wrappers import Response
+
+import active_data
+from active_data.actions import admission, result_cache, sql
+from jx_base.query import normalized
+from jx_elasticsearch import es52, meta
+from jx_elasticsearch.es52 import aggs
+from jx_python import expression_compiler
+from mo_dots import Data, literal_field
+from mo_future import text_type
+from mo_json import value2json
+from mo_logs import Log
+from mo_logs.strings import unicode2utf8
+from mo_threads.threads import RegisterThread
+from pyLibrary.env import elasticsearch
+from pyLibrary.env.flask_wrappers import cors_wrapper
+
+
+@cors_wrapper
+def send_stats():
+    """
+    SEND THE INTERNAL COUNTERS, FOR SCRAPING BY MONITORING
+    """
+    with RegisterThread():
+        try:
+            output = Data()
+            for (host, port), cluster in list(elasticsearch.known_clusters.items()):
+                output.elasticsearch[literal_field(host + ":" + text_type(port))].pool = cluster.pool.stats
+            for writer in list(elasticsearch.known_writers):
+                output.bulk_writers[literal_field(writer.index.settings.index)] = writer.stats
+            for namespace in list(meta.known_clusters.values()):
+                output.metadata[literal_field(namespace.meta.columns.db_file.name)].load = namespace.meta.columns.load_stats
+            output.compiled_expressions = expression_compiler.compiled.stats
+            output.compiled_aggs_decoders = aggs.compiled_decoders.stats
+            output.normalized_queries = normalized.stats
+            output.es_plans = es52.plan_stats.copy()
+            output.es_plans.count = len(es52.plans)
+            output.parsed_sql = sql.parsed.stats
+            if result_cache.cache is not None:
+                output.result_cache = result_cache.cache.stats
+            if admission.controller is not None:
+                output.admission = admission.controller.stats
+            if active_data.request_log is not None:
+                output.request_log = active_data.request_log.stats
+            return Response(
+                unicode2utf8(value2json(output)),
+                status=200,
+                headers={
+                    "Content-Type": "application/json"
+                }
+            )
+        except Exception as e:
+            Log.error("Could not return stats", cause=e)
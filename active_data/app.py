@@ -19,13 +19,16 @@ from werkzeug.wrappers import Response
 
 import active_data
 from active_data import OVERVIEW, record_request
-from active_data.actions import save_query
+from active_data.actions import admission, result_cache, save_query
+from active_data.actions.batch import jx_batch_query
 from active_data.actions.contribute import send_contribute
 from active_data.actions.json import get_raw_json
 from active_data.actions.query import jx_query
 from active_data.actions.save_query import SaveQueries, find_query
 from active_data.actions.sql import sql_query
+from active_data.actions.stats import send_stats
 from active_data.actions.static import download, send_favicon
+from active_data.request_log import RequestLog
 from jx_base import container
 from mo_dots import is_data
 from mo_files import File, TempFile
@@ -69,12 +72,14 @@ flask_app.add_url_rule('/tools/<path:filename>', None, download)
 flask_app.add_url_rule('/favicon.ico', None, send_favicon)
 flask_app.add_url_rule('/contribute.json', None, send_contribute)
 flask_app.add_url_rule('/find/<path:hash>', None, find_query)
+flask_app.add_url_rule('/query/batch', None, jx_batch_query, defaults={'path': ''}, methods=['POST'])
 flask_app.add_url_rule('/query', None, jx_query, defaults={'path': ''}, methods=['GET', 'POST'])
 flask_app.add_url_rule('/query/', None, jx_query, defaults={'path': ''}, methods=['GET', 'POST'])
 flask_app.add_url_rule('/query/<path:path>', None, jx_query, defaults={'path': ''}, methods=['GET', 'POST'])
 flask_app.add_url_rule('/sql', None, sql_query, defaults={'path': ''}, methods=['GET', 'POST'])
 flask_app.add_url_rule('/sql/', None, sql_query, defaults={'path': ''}, methods=['GET', 'POST'])
 flask_app.add_url_rule('/json/<path:path>', None, get_raw_json, methods=['GET'])
+flask_app.add_url_rule('/__stats__', None, send_stats, methods=['GET'])
 
 
 @flask_app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
@@ -115,7 +120,10 @@ def setup():
     if config.request_logs:
         cluster = elasticsearch.Cluster(config.request_logs)
         request_logger = cluster.get_or_create_index(config.request_logs)
-        active_data.request_log_queue = request_logger.threaded_queue(max_size=2000)
+        active_data.request_log = RequestLog(
+            writer=request_logger.threaded_queue(silent=True),
+            kwargs=config.request_logs.buffer
+        )
 
     if config.dockerflow:
         def backend_check():
@@ -129,6 +137,14 @@ def setup():
         "settings": config.elasticsearch.copy()
     }
 
+    if config.result_cache:
+        result_cache.setup(config.result_cache)
+    else:
+        result_cache.setup()
+
+    if config.admission:
+        admission.setup(config.admission)
+
     # TRIGGER FIRST INSTANCE
     if config.saved_queries:
         setattr(save_query, "query_finder", SaveQueries(config.saved_queries))
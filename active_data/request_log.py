@@ -0,0 +1,139 @@
+# encoding: utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+from __future__ import absolute_import, division, unicode_literals
+
+from itertools import count
+import random
+
+from mo_dots import Data, wrap
+from mo_json import value2json
+from mo_kwargs import override
+from mo_logs import Log
+from mo_threads import Thread, Till
+from mo_times.dates import Date
+
+DEBUG = False
+MAX_DATA = 10000  # CHARACTERS OF REQUEST BODY TO KEEP
+
+
+class RequestLog(object):
+    """
+    RING BUFFER OF REQUESTS, SHIPPED TO ES BY ITS OWN THREAD
+
+    THE SERVING THREAD ONLY TAKES A SEQUENCE NUMBER AND STORES A TUPLE; IT
+    NEVER WAITS, AND NEVER SERIALIZES.  IF THE SHIPPER FALLS BEHIND, THE
+    OLDEST RECORDS ARE OVERWRITTEN, AND COUNTED AS dropped
+    """
+
+    @override
+    def __init__(
+        self,
+        writer,  # THE Index WRITER (threaded_queue) TO SEND THE LOGS TO
+        size=4096,  # NUMBER OF REQUESTS THE BUFFER HOLDS
+        sample=1.0,  # FRACTION OF SUCCESSFUL REQUESTS TO LOG; ERRORS ARE ALWAYS LOGGED
+        period=1,  # SECONDS BETWEEN SHIPMENTS
+        kwargs=None
+    ):
+        self.writer = writer
+        self.size = size
+        self.sample = sample
+        self.slots = [None] * size  # EACH IS (seq, record)
+        self.next_seq = count()  # next() IS ATOMIC, SO NO LOCK IS NEEDED TO CLAIM A SLOT
+        self.read_seq = 0  # ONLY THE SHIPPER TOUCHES THIS
+        self.counts = Data(sampled_out=0, dropped=0, shipped=0, failed=0)
+        self.shipper = Thread.run("request log shipper", self._shipper, period)
+
+    def add(self, request, query, data, error):
+        """
+        CALLED ON THE SERVING THREAD; ONLY COPY WHAT WILL NOT OUTLIVE THE REQUEST
+        """
+        if error is None and self.sample < 1 and random.random() >= self.sample:
+            self.counts.sampled_out += 1  # NOT EXACT UNDER CONTENTION, BUT NO LOCK
+            return
+        headers = request.headers
+        record = (
+            Date.now(),
+            headers.get("user_agent"),
+            headers.get("accept_encoding"),
+            headers.environ["werkzeug.request"].full_path,
+            headers.get("content_length"),
+            request.remote_addr,
+            headers.get("from"),
+            query,
+            data,
+            error
+        )
+        seq = next(self.next_seq)
+        self.slots[seq % self.size] = (seq, record)
+
+    def _shipper(self, period, please_stop):
+        while not please_stop:
+            (Till(seconds=period) | please_stop).wait()
+            self._ship()
+        self._ship()
+
+    def _ship(self):
+        logs = []
+        while True:
+            slot = self.slots[self.read_seq % self.size]
+            if slot is None:
+                break
+            seq, record = slot
+            if seq < self.read_seq:
+                # NOT WRITTEN YET
+                break
+            if seq > self.read_seq:
+                # THE WRITERS LAPPED US; SKIP TO THE OLDEST RECORD STILL IN THE BUFFER
+                oldest = seq - self.size + 1
+                self.counts.dropped += oldest - self.read_seq
+                self.read_seq = oldest
+                continue
+            self.read_seq += 1
+            try:
+                logs.append({"value": _to_log(record)})
+            except Exception as e:
+                self.counts.failed += 1
+                Log.warning("Can not record", cause=e)
+
+        if not logs:
+            return
+        DEBUG and Log.note("ship {{num}} request logs", num=len(logs))
+        try:
+            self.writer.extend(logs)
+            self.counts.shipped += len(logs)
+        except Exception as e:
+            self.counts.failed += len(logs)
+            Log.warning("Can not ship request logs", cause=e)
+
+    @property
+    def stats(self):
+        return self.counts.copy()
+
+    def stop(self):
+        self.shipper.stop()
+        self.shipper.join()
+
+
+def _to_log(record):
+    timestamp, user_agent, accept_encoding, path, content_length, remote_addr, frum, query, data, error = record
+    if data and len(data) > MAX_DATA:
+        data = data[:MAX_DATA]
+    log = wrap({
+        "timestamp": timestamp,
+        "http_user_agent": user_agent,
+        "http_accept_encoding": accept_encoding,
+        "path": path,
+        "content_length": content_length,
+        "remote_addr": remote_addr,
+        "query_text": value2json(query),
+        "data": data,
+        "error": value2json(error)
+    })
+    log["from"] = frum
+    return log
@@ -0,0 +1,80 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from mo_dots import Data
+from mo_json import json2value, value2json
+from mo_logs.strings import utf82unicode
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Lock, Thread, Till
+from pyLibrary.env.elasticsearch import BulkWriter
+
+
+class FakeIndex(object):
+    """
+    ENOUGH OF Index FOR THE BulkWriter; REMEMBERS WHAT WAS SENT
+    """
+
+    def __init__(self, delay=0):
+        self.settings = Data(index="fake")
+        self.delay = delay
+        self.locker = Lock()
+        self.received = []
+        self.most_pending = 0
+
+    def _bulk_action(self, record):
+        return '{"index":{}}', value2json(record)
+
+    def _bulk_post(self, data):
+        if self.delay:
+            Till(seconds=self.delay).wait()
+        docs = [json2value(d) for d in utf82unicode(data).strip().split("\n")[1::2]]
+        with self.locker:
+            self.received.extend(docs)
+        return [{"index": {"status": 201}} for _ in docs]
+
+    def _bulk_failures(self, items):
+        return []
+
+
+class TestBulkWriter(FuzzyTestCase):
+
+    def test_stop_sends_pending(self):
+        index = FakeIndex()
+        writer = BulkWriter(index=index, period=60)
+        writer.extend({"a": i} for i in range(10))
+        writer.stop()
+        self.assertEqual(sorted(d.a for d in index.received), list(range(10)))
+
+    def test_shutdown_does_not_hang(self):
+        # THE OWNER'S CHILD THREADS (THE WORKERS) ARE STOPPED, AND JOINED, WHEN IT ENDS,
+        # AS ON PROCESS SHUTDOWN
+        index = FakeIndex()
+
+        def owner(please_stop):
+            writer = BulkWriter(index=index, period=60)
+            writer.extend({"a": i} for i in range(10))
+            return writer
+
+        thread = Thread.run("bulk writer owner", owner)
+        thread.join(till=Till(seconds=20))  # RAISES IF THE WORKERS DO NOT STOP
+        self.assertEqual(sorted(d.a for d in index.received), list(range(10)), "expecting pending documents to be sent on shutdown")
+
+    def test_max_size(self):
+        index = FakeIndex(delay=0.1)
+        writer = BulkWriter(index=index, period=60, batch_size=2, max_size=4, concurrency=1)
+        most = 0
+        for i in range(20):
+            writer.add({"a": i})
+            most = max(most, writer.pending)
+        writer.stop()
+        self.assertLessEqual(most, 4)
+        self.assertEqual(sorted(d.a for d in index.received), list(range(20)))
@@ -0,0 +1,99 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from active_data.actions import TOO_MANY_QUERIES
+from active_data.actions.admission import AdmissionController, UNKNOWN_SELECTIVITY, _estimate, _selectivity, client_id
+from jx_base.expressions import TRUE, Variable, jx_expression
+from mo_dots import Data, wrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+def column(name, count=1000, cardinality=None, multi=1, nested_path="."):
+    return Data(name=name, count=count, cardinality=cardinality, multi=multi, nested_path=[nested_path])
+
+
+COLUMNS = {
+    "a": [column("a", cardinality=10)],
+    "b": [column("b", cardinality=4, multi=3)],
+    "c": [column("c", cardinality=2, multi=7, nested_path="c")]
+}
+
+
+class TestAdmission(FuzzyTestCase):
+
+    def test_selectivity(self):
+        self.assertEqual(_selectivity(TRUE, COLUMNS), 1)
+        self.assertAlmostEqual(_selectivity(jx_expression({"eq": {"a": "x"}}), COLUMNS), 0.1)
+        self.assertAlmostEqual(_selectivity(jx_expression({"in": {"b": ["x", "y"]}}), COLUMNS), 0.5)
+        self.assertAlmostEqual(_selectivity(jx_expression({"and": [{"eq": {"a": "x"}}, {"eq": {"b": "y"}}]}), COLUMNS), 0.025)
+        self.assertAlmostEqual(_selectivity(jx_expression({"or": [{"eq": {"a": "x"}}, {"eq": {"b": "y"}}]}), COLUMNS), 0.35)
+        self.assertAlmostEqual(_selectivity(jx_expression({"gt": {"a": 3}}), COLUMNS), UNKNOWN_SELECTIVITY)
+
+    def test_set_op_rows(self):
+        query = wrap({
+            "select": [{"name": "a"}, {"name": "b"}],
+            "limit": 10
+        })
+        query.where = jx_expression({"eq": {"a": "x"}})
+        # 1000 DOCS, 1/10 MATCH, LIMIT 10, ROOT COLUMNS HAVE UP TO 3 VALUES, 2 SELECTS
+        expected = {"hits": 100, "buckets": 0, "rows": 30, "cost": 60}
+        self.assertEqual(_estimate(query, COLUMNS, "."), expected)
+        # THE NESTED DOCUMENTS HAVE THEIR OWN multi
+        self.assertEqual(_estimate(query, COLUMNS, "c"), {"rows": 70})
+
+    def test_aggregate(self):
+        query = wrap({"select": [{"name": "count", "aggregate": "count"}]})
+        query.where = TRUE
+        self.assertEqual(_estimate(query, COLUMNS, "."), {"hits": 1000, "buckets": 1, "rows": 1, "cost": 1})
+
+    def test_groupby_limit(self):
+        columns = {
+            "a": [column("a", count=10 * 1000 * 1000, cardinality=100 * 1000)],
+            "b": [column("b", count=10 * 1000 * 1000, cardinality=50 * 1000)]
+        }
+        query = wrap({
+            "groupby": [
+                {"name": "a", "domain": {"type": "default", "limit": 10}},
+                {"name": "b", "domain": {"type": "default", "limit": 10}}
+            ],
+            "limit": 10
+        })
+        query.groupby[0].value = Variable("a")
+        query.groupby[1].value = Variable("b")
+        query.where = TRUE
+        # ES RETURNS ONLY limit GROUPS; EACH EDGE HAS limit PARTS, PLUS null
+        self.assertEqual(_estimate(query, columns, "."), {"hits": 10 * 1000 * 1000, "buckets": 121, "rows": 10, "cost": 121})
+
+    def test_client_id(self):
+        # THE CLIENT CAN SEND ANY X-Forwarded-For; ONLY THE ENTRIES ADDED BY OUR PROXIES COUNT
+        self.assertEqual(client_id("1.1.1.1, 2.2.2.2", "10.0.0.1", 1), "2.2.2.2")
+        self.assertEqual(client_id("1.1.1.1, 2.2.2.2, 3.3.3.3", "10.0.0.1", 2), "2.2.2.2")
+        self.assertEqual(client_id("2.2.2.2", "10.0.0.1", 1), "2.2.2.2")
+        self.assertEqual(client_id("2.2.2.2", "10.0.0.1", 2), "10.0.0.1")
+        self.assertEqual(client_id(None, "10.0.0.1", 1), "10.0.0.1")
+        self.assertEqual(client_id("1.1.1.1", "10.0.0.1", 0), "10.0.0.1")
+
+    def test_batch_holds_a_slot_per_query(self):
+        controller = AdmissionController(max_cost=1000, per_client=3, total=4, max_waiting=0, wait=0)
+
+        def one_more(client):
+            with controller.slot(client, None):
+                pass
+
+        with controller.slot("a", None, 3):
+            self.assertEqual(controller.stats.running, 3)
+            self.assertRaises(TOO_MANY_QUERIES, one_more, "a")
+            # ONLY ONE SLOT IS LEFT IN total
+            with controller.slot("b", None):
+                self.assertRaises(TOO_MANY_QUERIES, one_more, "b")
+        self.assertEqual(controller.stats.running, 0)
+        self.assertEqual(controller.stats.rejected.busy, 2)
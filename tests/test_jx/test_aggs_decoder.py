@@ -0,0 +1,131 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_elasticsearch.es52.aggs import aggs_iterator, compile_aggs_decoder
+from jx_elasticsearch.es52.es_query import Aggs, CountAggs, ExprAggs, FilterAggs, TermsAggs
+from mo_dots import Data, unwrap, wrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+class FakeDecoder(object):
+    """
+    THE COORDINATE IS WHAT THE DECODER WAS GIVEN
+    """
+
+    def __init__(self, dim):
+        self.edge = Data(dim=dim)
+
+    def get_index(self, parts, node, index):
+        return len(parts), parts[0].get("key"), index
+
+
+def _tree():
+    """
+    TWO NESTED terms EDGES, EACH WITH ITS _missing, AND TWO SELECTS
+    """
+    outer, inner = FakeDecoder(0), FakeDecoder(1)
+    count, maximum = Data(name="count"), Data(name="max")
+    inner_terms = TermsAggs("_match", {}, inner).add(CountAggs(count)).add(ExprAggs("max_v", {"max": {}}, maximum))
+    outer_terms = (
+        TermsAggs("_match", {}, outer)
+        .add(FilterAggs("_filter", None, None).add(inner_terms))
+        .add(FilterAggs("_missing", None, inner).add(CountAggs(count)))
+    )
+    root = (
+        Aggs()
+        .add(FilterAggs("_filter", None, None).add(outer_terms))
+        .add(FilterAggs("_missing", None, outer).add(CountAggs(count)))
+    )
+    return root, [outer, inner]
+
+
+def _response():
+    return wrap({
+        "_filter": {"doc_count": 7, "_match": {"buckets": [
+            {
+                "key": a,
+                "doc_count": [3, 0, 4][a],
+                "_filter": {"doc_count": 2, "_match": {"buckets": [
+                    {"key": b, "doc_count": [1, 0, 2][b], "max_v": {"value": a * 10 + b}}
+                    for b in range(3)
+                ]}},
+                "_missing": {"doc_count": a % 2}
+            }
+            for a in range(3)
+        ]}},
+        "_missing": {"doc_count": 1}
+    })
+
+
+def _reference(agg, children, parts, coord, give_me_zeros):
+    """
+    THE aggs WALK, ONE NODE AT A TIME, AS IT WAS BEFORE THE DECODER WAS COMPILED
+    """
+    for child in children:
+        name = child.name
+        if name is None:
+            found = [(None, agg, None)]
+        elif name == "_match":
+            found = [(i, b, b) for i, b in enumerate(agg[name].get("buckets", []))]
+        elif name.startswith("_match"):
+            found = [(int(name[6:]), agg[name], agg[name])]
+        elif name.startswith("_missing"):
+            found = [(None, agg[name], agg[name])]
+        else:
+            found = [(None, agg[name], None)]
+
+        for index, c_agg, part in found:
+            if c_agg.get("doc_count") == 0 and not give_me_zeros:
+                continue
+            c_parts = parts if part is None else (part,) + parts
+            for d in child.decoders:
+                coord[d.edge.dim] = d.get_index(c_parts, child, index)
+            if child.selects or not child.children:
+                yield parts, tuple(coord), c_agg, child.selects
+            else:
+                for row in _reference(c_agg, child.children, c_parts, coord, give_me_zeros):
+                    yield row
+
+
+def _rows(iterator):
+    return [(tuple(p.get("key") for p in parts), coord, id(unwrap(agg)), [s.name for s in selects]) for parts, coord, agg, selects in iterator]
+
+
+class TestAggsDecoder(FuzzyTestCase):
+
+    def test_same_as_reference(self):
+        root, decoders = _tree()
+        aggs = _response()
+        for give_me_zeros in (False, True):
+            expected = _rows(_reference(aggs, root.children, (), [0, 0], give_me_zeros))
+            result = _rows(aggs_iterator(aggs, root, decoders, give_me_zeros))
+            self.assertEqual(result, expected, "give_me_zeros=" + repr(give_me_zeros))
+
+        # SPOT CHECK: THE MAX OF THE LAST INNER BUCKET OF THE LAST OUTER BUCKET
+        last = list(aggs_iterator(aggs, root, decoders))
+        self.assertEqual([wrap(agg).value for _, _, agg, selects in last if selects[0].name == "max"][-1], 22)
+
+    def test_empty_buckets(self):
+        root, decoders = _tree()
+        aggs = wrap({"_filter": {"doc_count": 0, "_match": {}}, "_missing": {"doc_count": 0}})
+        self.assertEqual(list(aggs_iterator(aggs, root, decoders)), [])
+
+    def test_shape_is_shared(self):
+        first, _ = _tree()
+        second, _ = _tree()
+        decode1, nodes1 = compile_aggs_decoder(first)
+        decode2, nodes2 = compile_aggs_decoder(second)
+        self.assertIs(decode1, decode2, "expecting queries of the same shape to share the compiled decoder")
+        self.assertIsNot(nodes1[0], nodes2[0])
+
+        other = Aggs().add(TermsAggs("_match", {}, FakeDecoder(0)).add(CountAggs(Data(name="count"))))
+        self.assertIsNot(compile_aggs_decoder(other)[0], decode1)
@@ -0,0 +1,122 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from jx_base import Column
+from jx_base.query import QueryOp
+from jx_elasticsearch import meta
+from jx_elasticsearch.es52 import ES52
+from jx_elasticsearch.es52.aggs import aggs_plan
+from jx_python.meta import ColumnList
+from mo_dots import Data, ROOT_PATH, wrap
+from mo_json import value2json
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times import Date
+
+
+class FakeNamespace(object):
+    """
+    ENOUGH OF THE ElasticsearchMetadata TO NORMALIZE AND PLAN A QUERY
+    """
+
+    def __init__(self, columns):
+        self.meta = Data(columns=columns)
+        self.alias_to_query_paths = {"test": [ROOT_PATH]}
+
+    def get_columns(self, table_name, column_name=None, after=None, timeout=None):
+        return self.meta.columns.find("test", column_name)
+
+    def get_snowflake(self, name):
+        return meta.Snowflake(name, self)
+
+    def get_schema(self, name):
+        return self.get_snowflake(name).get_schema(".")
+
+    def touch(self, columns):
+        pass
+
+
+class FakeES(object):
+    """
+    REMEMBERS THE ES QUERY, AND RESPONDS WITH ONE BUCKET PER KEY
+    """
+    settings = wrap({"alias": "test", "stored_scripts": False})
+
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(value2json(query))
+        return wrap({
+            "hits": {"total": 5},
+            "aggregations": {
+                "_filter": {
+                    "doc_count": 5,
+                    "_filter": {"doc_count": 5, "_match": {"buckets": [{"key": "x", "doc_count": 3}, {"key": "y", "doc_count": 2}]}},
+                    "_missing": {"doc_count": 0}
+                }
+            }
+        })
+
+
+class TestAggsPlan(FuzzyTestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp = tempfile.mkdtemp()
+        os.chdir(self.temp)
+
+        columns = ColumnList("test")
+        for name, es_type, jx_type in [("a", "keyword", "string"), (".", "object", "exists")]:
+            columns.add(Column(
+                name=name,
+                es_index="test",
+                es_column=name,
+                es_type=es_type,
+                jx_type=jx_type,
+                nested_path=ROOT_PATH,
+                last_updated=Date.now(),
+                multi=1
+            ))
+        self.container = object.__new__(ES52)
+        self.container._namespace = FakeNamespace(columns)
+        self.container.es = FakeES()
+        self.container.name = "test"
+        self.container.rollover_field = None
+        self.container.edges = Data()
+        self.container.settings = wrap({})
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp, ignore_errors=True)
+
+    def test_plan_does_not_mark_up_query(self):
+        # QueryOp.wrap() RETURNS THE SAME QueryOp FOR THE SAME QUERY, SO EVERY PLAN OF IT MUST LEAVE IT ALONE
+        query = {"from": "test", "groupby": ["a"], "sort": {"value": "a", "sort": -1}, "select": {"aggregate": "count"}, "format": "list"}
+        first = QueryOp.wrap(wrap(query), container=self.container, namespace=self.container.namespace)
+        second = QueryOp.wrap(wrap(query), container=self.container, namespace=self.container.namespace)
+        self.assertIs(first, second, "expecting the normalized query to be memoized")
+        before = value2json(first.groupby[0].domain.__data__())
+        sort_before = first.groupby[0].domain.sort
+
+        results = []
+        for _ in range(2):
+            result = aggs_plan(first.frum, first)(self.container.es)
+            results.append(value2json(result.data))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(self.container.es.queries[0], self.container.es.queries[1])
+        self.assertEqual(value2json(first.groupby[0].domain.__data__()), before)
+        self.assertIs(first.groupby[0].domain.sort, sort_before, "expecting the plan to sort its own copy of the domain")
@@ -0,0 +1,63 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from jx_base import Column
+from jx_python.meta import ColumnList, INSERT, db_table_name
+from mo_dots import ROOT_PATH
+from mo_json import STRING
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Signal
+from mo_times import Date
+from pyLibrary.sql import SQL_FROM, SQL_ORDERBY, SQL_SELECT, SQL_WHERE
+from pyLibrary.sql.sqlite import quote_value
+
+
+def column(name, es_type="string"):
+    return Column(
+        name=name,
+        es_index="test_column_db",
+        es_column=name,
+        es_type=es_type,
+        jx_type=STRING,
+        last_updated=Date.now(),
+        nested_path=ROOT_PATH
+    )
+
+
+class TestColumnDb(FuzzyTestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.temp = tempfile.mkdtemp()
+        os.chdir(self.temp)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.temp, ignore_errors=True)
+
+    def test_bad_column_does_not_lose_batch(self):
+        columns = ColumnList("test")
+        updates = [
+            (INSERT, column("a")),
+            (INSERT, column("b", es_type={"not": "a value"})),  # CAN NOT BE A SQL PARAMETER
+            (INSERT, column("c"))
+        ]
+        columns._db_push(updates, Signal())
+
+        found = columns._query(
+            SQL_SELECT + "es_column" + SQL_FROM + db_table_name + SQL_WHERE + "es_index=" + quote_value("test_column_db") + SQL_ORDERBY + "es_column"
+        )
+        self.assertEqual([r[0] for r in found.data], ["a", "c"])
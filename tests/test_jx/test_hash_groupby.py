@@ -0,0 +1,59 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_python import jx
+from jx_python.group_by import groupby, hash_groupby
+from mo_dots import Null, unwrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+def _plain(groups):
+    return [(unwrap(k), [unwrap(r)["i"] for r in rows]) for k, rows in groups]
+
+
+def _sorted_groups(rows, keys):
+    # WHAT groupby() DID BEFORE hash_groupby(): SORT, THEN SCAN
+    return _plain(groupby(jx.sort(rows, keys), keys, contiguous=True))
+
+
+class TestHashGroupby(FuzzyTestCase):
+
+    def test_same_as_sorted_scan(self):
+        values = [1, "a", 2, None, 1, "a", 2.5, 1, None]
+        rows = [{"a": v, "b": i % 2, "i": i} for i, v in enumerate(values)]
+        for keys in (["a"], ["a", "b"], ["b", "a"]):
+            self.assertEqual(_plain(hash_groupby(rows, keys)), _sorted_groups(rows, keys), "keys " + repr(keys))
+
+    def test_rows_keep_their_order(self):
+        rows = [{"a": i % 3, "i": i} for i in range(10)]
+        self.assertEqual(
+            _plain(hash_groupby(rows, ["a"])),
+            [({"a": 0}, [0, 3, 6, 9]), ({"a": 1}, [1, 4, 7]), ({"a": 2}, [2, 5, 8])]
+        )
+
+    def test_booleans_are_not_numbers(self):
+        rows = [{"a": True, "i": 0}, {"a": 1, "i": 1}, {"a": False, "i": 2}, {"a": 0, "i": 3}, {"a": True, "i": 4}]
+        groups = _plain(hash_groupby(rows, ["a"]))
+        self.assertEqual(len(groups), 4)
+        self.assertEqual(groups, _sorted_groups(rows, ["a"]))
+
+    def test_nan_is_null(self):
+        rows = [{"a": float("nan"), "i": 0}, {"a": None, "i": 1}, {"a": 1, "i": 2}]
+        groups = _plain(hash_groupby(rows, ["a"]))
+        self.assertEqual([g[1] for g in groups], [[2], [0, 1]])
+
+    def test_unhashable_falls_back(self):
+        rows = [{"a": {"b": 1}, "i": 0}, {"a": {"b": 0}, "i": 1}, {"a": {"b": 1}, "i": 2}]
+        self.assertEqual(_plain(groupby(rows, ["a"])), _sorted_groups(rows, ["a"]))
+
+    def test_empty(self):
+        self.assertIs(hash_groupby([], ["a"]), Null)
@@ -0,0 +1,77 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+import random
+from unittest import skipIf
+
+from jx_python import jx
+from jx_python.containers.list_usingPythonList import ListContainer
+from jx_python.lists import aggs
+from mo_json import value2json
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+def _rows():
+    rand = random.Random(42)
+    output = []
+    for i in range(3000):
+        output.append({
+            "g": rand.choice(["a", "b", "c", None]),
+            "h": rand.choice([1, 2]),
+            "v": rand.random() * 100 if i % 11 else None,
+            "n": rand.randint(-1000, 1000)
+        })
+    return output
+
+
+class TestListAggs(FuzzyTestCase):
+    """
+    THE numpy BACKEND MUST GIVE EXACTLY WHAT THE ROW-BY-ROW ACCUMULATORS GIVE
+    """
+
+    def _both(self, query):
+        container = ListContainer("t", _rows())
+        calls = []
+        reduce = aggs._numpy_reduce
+
+        def counting_reduce(*args):
+            calls.append(1)
+            return reduce(*args)
+
+        old = aggs.USE_NUMPY, aggs._numpy_reduce
+        try:
+            aggs.USE_NUMPY, aggs._numpy_reduce = True, counting_reduce
+            fast = value2json(jx.run(dict(query, **{"from": "t"}), container=container))
+            aggs.USE_NUMPY = False
+            slow = value2json(jx.run(dict(query, **{"from": "t"}), container=container))
+        finally:
+            aggs.USE_NUMPY, aggs._numpy_reduce = old
+        self.assertTrue(calls, "expecting the numpy backend to be used")
+        self.assertTrue(fast == slow, "expecting\n" + slow + "\nnot\n" + fast)
+
+    @skipIf(aggs.np is None, "numpy is not installed")
+    def test_float_sum(self):
+        self._both({"edges": ["g"], "select": {"name": "v", "value": "v", "aggregate": "sum"}})
+
+    @skipIf(aggs.np is None, "numpy is not installed")
+    def test_many_aggregates(self):
+        self._both({
+            "edges": ["g", "h"],
+            "select": [
+                {"name": "count", "value": "v", "aggregate": "count"},
+                {"name": "sum", "value": "n", "aggregate": "sum"},
+                {"name": "min", "value": "v", "aggregate": "min"},
+                {"name": "max", "value": "n", "aggregate": "max"},
+                {"name": "median", "value": "v", "aggregate": "percentile", "percentile": 0.5}
+            ]
+        })
+
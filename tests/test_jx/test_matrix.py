@@ -0,0 +1,88 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from mo_collections.matrix import ArrayMatrix, INTEGER_TYPECODE, Matrix, SparseMatrix
+from mo_future import long
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+DIMS = (3, 4, 2)
+
+
+def _fill(*matrices):
+    # EVERY THIRD CELL IS LEFT EMPTY
+    for i, c in enumerate(Matrix(dims=DIMS)._all_combos()):
+        if i % 3:
+            for m in matrices:
+                m[c] = i
+
+
+def _plain(value):
+    # Null AND None ARE THE SAME CELL
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return None if value == None else value
+
+
+class TestMatrix(FuzzyTestCase):
+
+    def test_same_as_matrix(self):
+        expected = Matrix(dims=DIMS)
+        dense = ArrayMatrix(DIMS, typecode=INTEGER_TYPECODE)
+        sparse = SparseMatrix(DIMS)
+        _fill(expected, dense, sparse)
+
+        for m in (dense, sparse):
+            self.assertEqual(_plain(m.cube), _plain(expected.cube))
+            self.assertEqual([(c, _plain(v)) for c, v in m.items()], [(c, _plain(v)) for c, v in expected.items()])
+            self.assertEqual(sorted(m.nonempty_items()), sorted((c, v) for c, v in expected.items() if v != None))
+            for index in [1, (1,), (1, 2), (2, 3, 1), (0, 0, 0)]:
+                self.assertEqual(_plain(m[index]), _plain(expected[index]), "for index " + repr(index))
+
+    def test_counts_stay_integers(self):
+        dense = ArrayMatrix((2,), zeros=0, typecode=INTEGER_TYPECODE)
+        dense[0] = 2 ** 40
+        self.assertIs(dense[0].__class__, (2 ** 40).__class__)
+        self.assertIs(dense[1].__class__, (0).__class__)
+        self.assertEqual(dense[0], 2 ** 40)
+
+    def test_long_coordinates(self):
+        dense = ArrayMatrix((2, 2))
+        sparse = SparseMatrix((2, 2))
+        for m in (dense, sparse):
+            m[long(1), long(0)] = 3
+            self.assertEqual(m[1, 0], 3)
+            self.assertEqual(m[long(1), long(0)], 3)
+
+    def test_not_a_number(self):
+        dense = ArrayMatrix((2,), typecode="d")
+        dense[0] = 1.5
+        dense[1] = "x"
+        self.assertEqual(dense.cube, [1.5, "x"])
+
+    def test_sparse_zeros(self):
+        sparse = SparseMatrix((2, 3), zeros=0)
+        sparse[1, 2] = 5
+        self.assertEqual(sparse.cube, [[0, 0, 0], [0, 0, 5]])
+        self.assertEqual(sparse[0, 1], 0)
+        self.assertEqual(list(sparse.nonempty_items()), [((1, 2), 5)])
+
+    def test_cube_built_once(self):
+        for m in (ArrayMatrix((2, 3), typecode="d"), SparseMatrix((2, 3))):
+            m[0, 1] = 2
+            cube = m.cube
+            self.assertIs(m.cube, cube, "expecting the cube to be kept between reads")
+            m.forall(lambda v, c, whole: self.assertIs(whole, cube))
+
+            # A CHANGE MAKES A NEW cube
+            m[1, 2] = 4
+            self.assertIsNot(m.cube, cube)
+            self.assertEqual(m.cube, [[None, 2, None], [None, None, 4]])
@@ -0,0 +1,119 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_elasticsearch import post
+from jx_elasticsearch.multisearch import MultiSearch
+from mo_dots import Data, wrap
+from mo_json import json2value
+from mo_logs.strings import utf82unicode
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_threads import Lock, Till
+
+
+class FakeCluster(object):
+    """
+    ANSWERS _msearch WITH ONE HIT PER SEARCH, NAMED index:size; size 13 IS AN ERROR
+    """
+    url = "http://fake:9200"
+
+    def __init__(self):
+        self.locker = Lock()
+        self.requests = []  # (path, NUMBER OF SEARCHES) FOR EACH REQUEST
+
+    def post(self, path, data=None, **kwargs):
+        lines = utf82unicode(data).strip().split("\n")
+        with self.locker:
+            self.requests.append((path, len(lines) // 2))
+        responses = []
+        for header, query in zip(lines[::2], lines[1::2]):
+            query = json2value(query)
+            if query.size == 13:
+                responses.append({"error": {"type": "boom"}})
+            else:
+                responses.append({"_shards": {"failed": 0}, "hits": {"hits": [{"_id": json2value(header).index + ":" + str(query.size)}]}})
+        return wrap({"responses": responses})
+
+
+class FakeIndex(object):
+
+    def __init__(self, cluster, name):
+        self.cluster = cluster
+        self.path = "/" + name + "/test"
+        self.settings = Data(timeout=30)
+
+    def search(self, query):
+        with self.cluster.locker:
+            self.cluster.requests.append(("_search", 1))
+        return wrap({"hits": {"hits": [{"_id": "single:" + str(query.size)}]}})
+
+
+class TestMultiSearch(FuzzyTestCase):
+
+    def setUp(self):
+        self.cluster = FakeCluster()
+        self.indexes = [FakeIndex(self.cluster, "a"), FakeIndex(self.cluster, "b")]
+
+    def _query(self, i, rounds):
+        # QUERY i SEARCHES rounds TIMES, TAKING LONGER BETWEEN SEARCHES THAN THE QUERIES BEFORE IT
+        output = []
+        for r in range(rounds):
+            output.append(post(self.indexes[i % 2], Data(size=i * 10 + r), None).hits.hits[0]._id)
+            Till(seconds=0.01 * i).wait()
+        return output
+
+    def test_rounds(self):
+        def bad():
+            return post(self.indexes[0], Data(size=13), None)
+
+        def no_search():
+            return "no search"
+
+        def fail():
+            raise Exception("oops")
+
+        batch = MultiSearch()
+        batch.run("0", self._query, 0, 1)
+        batch.run("1", self._query, 1, 3)
+        batch.run("2", self._query, 2, 2)
+        batch.run("bad", bad)
+        batch.run("no search", no_search)
+        batch.run("fail", fail)
+        members = batch.wait()
+
+        self.assertEqual([m.response for m in members[:3]], [["a:0"], ["b:10", "b:11", "single:12"], ["a:20", "a:21"]])
+        self.assertEqual([m.searches for m in members], [1, 3, 2, 1, 0, 0])
+        self.assertEqual(members[3].response, None)
+        self.assertIn("boom", members[3].error)
+        self.assertEqual(members[4].response, "no search")
+        self.assertEqual(members[4].error, None)
+        self.assertIn("oops", members[5].error)
+
+        # EVERY ROUND WAITS FOR ALL QUERIES STILL RUNNING; A LONE SEARCH IS NOT SENT AS _msearch
+        self.assertEqual(self.cluster.requests, [("/_msearch", 4), ("/_msearch", 2), ("_search", 1)])
+        self.assertEqual(batch.stats, {"requests": 3, "searches": 7})
+
+    def test_not_a_member(self):
+        self.assertEqual(post(self.indexes[0], Data(size=5), None).hits.hits[0]._id, "single:5")
+        self.assertEqual(self.cluster.requests, [("_search", 1)])
+
+    def test_waves(self):
+        # A BATCH LIMITED TO TWO QUERIES AT ONCE WAITS ON EACH PAIR IN TURN
+        batch = MultiSearch()
+        for start in (0, 2):
+            for i in range(start, start + 2):
+                batch.run(str(i), self._query, i, 1)
+            batch.wait()
+        members = batch.wait()
+
+        self.assertEqual([m.response for m in members], [["a:0"], ["b:10"], ["a:20"], ["b:30"]])
+        self.assertEqual(self.cluster.requests, [("/_msearch", 2), ("/_msearch", 2)])
+        self.assertEqual(batch.stats, {"requests": 2, "searches": 4})
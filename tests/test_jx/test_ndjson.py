@@ -0,0 +1,46 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_elasticsearch.es52 import format
+from jx_elasticsearch.es52.aggs import format_dispatch
+from jx_python import jx
+from jx_python.containers.list_usingPythonList import ListContainer
+from mo_dots import Data, unwrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+class TestNdjson(FuzzyTestCase):
+    """
+    EVERY QUERY TYPE ACCEPTS format:"ndjson", AND GIVES data THAT CAN BE SENT ONE ROW PER LINE
+    """
+
+    def test_list_container(self):
+        rows = [{"a": i} for i in range(3)]
+        result = jx.run({"from": ListContainer("t", rows), "format": "ndjson"})
+        self.assertEqual(unwrap(result.data), rows)
+        self.assertEqual(result.meta.content_type, "application/x-ndjson")
+
+    def test_aggs(self):
+        self.assertIn("ndjson", format_dispatch)
+        self.assertEqual(format_dispatch["ndjson"][3], "application/x-ndjson")
+
+        old = format.format_list
+        try:
+            # A SINGLE AGGREGATE IS ONE LINE
+            format.format_list = lambda *args: Data(meta={"format": "value"}, data={"count": 5})
+            self.assertEqual(format.format_ndjson(None, None, None, None, None).data, [{"count": 5}])
+            format.format_list = lambda *args: Data(meta={"format": "value"}, data=5)
+            self.assertEqual(format.format_ndjson(None, None, None, None, None).data, [5])
+            format.format_list = lambda *args: Data(meta={"format": "list"}, data=[{"a": 1}, {"a": 2}])
+            self.assertEqual(format.format_ndjson(None, None, None, None, None).data, [{"a": 1}, {"a": 2}])
+        finally:
+            format.format_list = old
@@ -0,0 +1,38 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from active_data.actions import result_cache
+from mo_dots import wrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+class TestResultCache(FuzzyTestCase):
+
+    def tearDown(self):
+        result_cache.setup()
+
+    def test_off_by_default(self):
+        result_cache.setup()
+        self.assertIsNone(result_cache.cache)
+        self.assertEqual(result_cache.get_key(wrap({"from": "t"}), None), (None, {"from": "t"}))
+        result_cache.put(None, ("application/json", b"{}"))
+        self.assertIsNone(result_cache.get(None))
+
+    def test_size_is_body_bytes(self):
+        result_cache.setup(enabled=True, max_size=10)
+        result_cache.put("query:a", ("application/json", b"123456"))
+        result_cache.put("sql:a", ("application/json", b"123"))
+        self.assertEqual(result_cache.get("query:a"), ("application/json", b"123456"))
+        self.assertEqual(result_cache.get("sql:a"), ("application/json", b"123"))
+        # OVER max_size BYTES; THE OLDEST IS EVICTED
+        result_cache.put("batch:a", ("application/json", b"1234"))
+        self.assertIsNone(result_cache.get("query:a"))
@@ -0,0 +1,126 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_base.expressions import TRUE, jx_expression
+from jx_elasticsearch.es52 import rollover
+from jx_elasticsearch.es52.rollover import prune, rollover_indexes, time_bounds
+from mo_dots import Data, wrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times import DAY, Date, HOUR
+
+START = Date("2019-01-01")
+
+
+def day(i):
+    return (START + i * DAY).unix
+
+
+class FakeCluster(object):
+
+    def __init__(self, aliases):
+        self.aliases = wrap(aliases)
+
+    def get_aliases(self):
+        return self.aliases
+
+
+def fake_alias(num, name="test"):
+    aliases = [
+        {"alias": name, "index": name + (START + i * DAY).format("%Y%m%d_%H%M%S")}
+        for i in range(num)
+    ]
+    # OTHER ALIASES ARE IGNORED
+    aliases.append({"alias": "other", "index": "other20190101_000000"})
+    return Data(cluster=FakeCluster(aliases), settings={"index": name}, path="/" + name + "/test")
+
+
+def index(i, name="test"):
+    return name + (START + i * DAY).format("%Y%m%d_%H%M%S")
+
+
+class TestRollover(FuzzyTestCase):
+
+    def test_rollover_indexes(self):
+        es = fake_alias(3)
+        self.assertEqual(
+            rollover_indexes(es.cluster, "test"),
+            [(None, day(1), index(0)), (day(1), day(2), index(1)), (day(2), None, index(2))]
+        )
+
+    def test_not_rollover(self):
+        cluster = FakeCluster([{"alias": "test", "index": "test"}])
+        self.assertEqual(rollover_indexes(cluster, "test"), [])
+
+    def assertNotPruned(self, es, result):
+        output, keep = result
+        self.assertIs(output, es)
+        self.assertIsNone(keep)
+
+    def test_time_bounds(self):
+        self.assertEqual(time_bounds(TRUE, "t"), (None, None))
+        self.assertEqual(time_bounds(jx_expression({"eq": {"t": 5}}), "t"), (5, 5))
+        self.assertEqual(time_bounds(jx_expression({"gt": {"t": 5}}), "t"), (5, None))
+        self.assertEqual(time_bounds(jx_expression({"gte": {"t": 5}}), "t"), (5, None))
+        self.assertEqual(time_bounds(jx_expression({"lt": {"t": 5}}), "t"), (None, 5))
+        self.assertEqual(time_bounds(jx_expression({"lte": {"t": 5}}), "t"), (None, 5))
+        self.assertEqual(time_bounds(jx_expression({"and": [{"gt": {"t": 3}}, {"gt": {"t": 4}}, {"lt": {"t": 9}}]}), "t"), (4, 9))
+        # OTHER FIELDS, AND or, DO NOT BOUND
+        self.assertEqual(time_bounds(jx_expression({"gt": {"u": 5}}), "t"), (None, None))
+        self.assertEqual(time_bounds(jx_expression({"or": [{"gt": {"t": 3}}, {"lt": {"t": 1}}]}), "t"), (None, None))
+
+    def test_no_bounds(self):
+        es = fake_alias(10)
+        self.assertNotPruned(es, prune(es, TRUE, "t"))
+
+    def test_eq(self):
+        es = fake_alias(10)
+        output, keep = prune(es, jx_expression({"eq": {"t": day(3) + 12 * HOUR.seconds}}), "t")
+        self.assertEqual(keep, [index(3)])
+        self.assertEqual(output.path, "/" + index(3) + "/test")
+        # A DOCUMENT AT THE START OF AN INDEX MAY BE IN THE ONE BEFORE
+        _, keep = prune(es, jx_expression({"eq": {"t": day(3)}}), "t")
+        self.assertEqual(keep, [index(2), index(3)])
+
+    def test_gt(self):
+        es = fake_alias(10)
+        _, keep = prune(es, jx_expression({"gt": {"t": day(7) + 12 * HOUR.seconds}}), "t")
+        self.assertEqual(keep, [index(7), index(8), index(9)])
+        # THE LAST INDEX HAS NO END
+        _, keep = prune(es, jx_expression({"gt": {"t": day(20)}}), "t")
+        self.assertEqual(keep, [index(9)])
+
+    def test_lt(self):
+        es = fake_alias(10)
+        _, keep = prune(es, jx_expression({"lt": {"t": day(1) + 12 * HOUR.seconds}}), "t")
+        self.assertEqual(keep, [index(0), index(1)])
+        # THE FIRST INDEX HAS NO START
+        _, keep = prune(es, jx_expression({"lt": {"t": day(-20)}}), "t")
+        self.assertEqual(keep, [index(0)])
+
+    def test_empty(self):
+        es = fake_alias(10)
+        output, keep = prune(es, jx_expression({"and": [{"gt": {"t": day(5) + 1}}, {"lt": {"t": day(3) + 1}}]}), "t")
+        # STILL SEARCH ONE INDEX, FOR AN EMPTY RESPONSE
+        self.assertEqual(keep, [index(9)])
+        self.assertEqual(output.path, "/" + index(9) + "/test")
+
+    def test_few_pruned(self):
+        es = fake_alias(20)
+        # ONLY ONE OF 20 PRUNED: SEARCH THE ALIAS
+        self.assertNotPruned(es, prune(es, jx_expression({"gt": {"t": day(1) + 1}}), "t"))
+
+    def test_long_path(self):
+        # A YEAR OF DAILY INDEXES, MOST OF THEM KEPT, IS TOO LONG FOR THE URL
+        es = fake_alias(365)
+        self.assertEqual(prune(es, jx_expression({"gt": {"t": day(300)}}), "t")[1], [index(i) for i in range(299, 365)])
+        self.assertTrue(len(",".join(index(i) for i in range(7, 365))) > rollover.MAX_PATH_LENGTH)
+        self.assertNotPruned(es, prune(es, jx_expression({"gt": {"t": day(7) + 1}}), "t"))
@@ -0,0 +1,60 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from active_data.actions import sql
+from active_data.actions.sql import cached_parse_sql, parameterize, parse_sql
+from mo_json import value2json
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+STATEMENTS = [
+    "select a, count(1) from t where b='x' and c>1.5 group by a limit 10",
+    "select a, count(1) from t where b='y''s' and c>1.5 group by a limit 10",
+    "select a from t where x in ('a','b') and y='a'",
+    "select a from t where x in ('c','d') and y='c'",
+    "select \"it's\" from t where d > 'b'",
+    "select a+1, count(1) from t where b='x' group by a+1"
+]
+
+
+class TestSqlCache(FuzzyTestCase):
+
+    def setUp(self):
+        sql.parsed.clear()
+
+    def test_parameterize(self):
+        template, literals = parameterize("select a from t where b='x' and c='it''s' and d='x' and \"e'\"=1")
+        self.assertEqual(
+            template,
+            "select a from t where b='__jx_literal_0__' and c='__jx_literal_1__' and d='__jx_literal_0__' and \"e'\"=1"
+        )
+        self.assertEqual(literals, {"__jx_literal_0__": "x", "__jx_literal_1__": "it's"})
+
+    def test_placeholder_in_sql(self):
+        # A STATEMENT THAT ALREADY HOLDS A PLACEHOLDER IS NOT PARAMETERIZED
+        statement = "select a from t where b='__jx_literal_0__'"
+        self.assertEqual(parameterize(statement), (statement, {}))
+
+    def test_same_as_parse_sql(self):
+        for statement in STATEMENTS:
+            result, _ = cached_parse_sql(statement)
+            self.assertEqual(value2json(result), value2json(parse_sql(statement)), "for " + statement)
+
+    def test_shapes_are_shared(self):
+        self.assertEqual([cached_parse_sql(s)[1] for s in STATEMENTS], ["miss", "hit", "miss", "hit", "miss", "miss"])
+
+    def test_result_is_a_copy(self):
+        first, _ = cached_parse_sql(STATEMENTS[0])
+        first.where = None
+        first.limit = 1
+        second, status = cached_parse_sql(STATEMENTS[0])
+        self.assertEqual(status, "hit")
+        self.assertEqual(value2json(second), value2json(parse_sql(STATEMENTS[0])))
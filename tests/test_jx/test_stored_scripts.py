@@ -0,0 +1,93 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from jx_elasticsearch.stored_scripts import StoredScripts, generated, lift_literals
+from mo_dots import unwrap
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+
+class FakeCluster(object):
+    """
+    REMEMBERS THE STORED SCRIPTS; REFUSES THE ONES WITH bad IN THEM
+    """
+
+    def __init__(self):
+        self.scripts = {}
+
+    def put(self, path, data):
+        if "bad" in data["script"]["source"]:
+            raise Exception("compile error")
+        self.scripts[path] = data["script"]["source"]
+
+
+class TestStoredScripts(FuzzyTestCase):
+
+    def test_constants_are_lifted(self):
+        canonical, params = lift_literals('doc["a.~s~"].value == "hello" && doc["b.~n~"].value > 2.5D && doc["c.~n~"].value < 7L')
+        self.assertEqual(
+            canonical,
+            'doc["a.~s~"].value == ((String)params.p0) && doc["b.~n~"].value > ((double)params.p1) && doc["c.~n~"].value < ((long)params.p2)'
+        )
+        self.assertEqual(params, {"p0": "hello", "p1": 2.5, "p2": 7})
+
+    def test_same_shape_same_script(self):
+        first, first_params = lift_literals('doc["a"].value == "x" ? 1.0 : 2.0')
+        second, second_params = lift_literals('doc["a"].value == "y \\"quoted\\"" ? 3.0 : 4.0')
+        self.assertEqual(first, second)
+        self.assertEqual(first_params, {"p0": "x", "p1": 1.0, "p2": 2.0})
+        self.assertEqual(second_params, {"p0": 'y "quoted"', "p1": 3.0, "p2": 4.0})
+
+    def test_template_constants_stay(self):
+        # PLAIN INTEGERS, CHARACTERS AND NAMES ARE PART OF THE TRANSLATOR'S TEMPLATES
+        source = "def v2 = doc[\"a\"].values; if (v2.size() == 0) return 'x'; return v2[0] + 1"
+        self.assertEqual(lift_literals(source), (source, {}))
+
+    def test_rewrite(self):
+        cluster = FakeCluster()
+        scripts = StoredScripts(cluster)
+        es_query = {
+            "query": {"script": {"script": {"source": generated('doc["a"].value == "x"'), "lang": "painless"}}},
+            "aggs": {
+                "m": {"max": {"script": generated('doc["a"].value + 1.5D')}},
+                "b": {"max": {"script": generated('bad + 1.5D')}},
+                "p": {"max": {"script": {"source": generated('doc["a"].value'), "params": {"given": 1}}}}
+            }
+        }
+        output = unwrap(scripts.rewrite(es_query))
+
+        ref = output["query"]["script"]["script"]
+        self.assertEqual(ref["params"], {"p0": "x"})
+        self.assertEqual(cluster.scripts["/_scripts/" + ref["id"]], 'doc["a"].value == ((String)params.p0)')
+        self.assertEqual(output["aggs"]["m"]["max"]["script"]["params"], {"p0": 1.5})
+        self.assertEqual(output["aggs"]["b"]["max"]["script"], 'bad + 1.5D', "expecting a script that will not store to be sent inline")
+        self.assertEqual(output["aggs"]["p"]["max"]["script"], es_query["aggs"]["p"]["max"]["script"], "expecting scripts with params to be left alone")
+        self.assertEqual(len(cluster.scripts), 2)
+
+        # THE SAME SHAPE IS NOT STORED AGAIN
+        cluster.scripts.clear()
+        again = unwrap(scripts.rewrite({"query": {"script": {"script": generated('doc["a"].value == "y"')}}}))
+        self.assertEqual(again["query"]["script"]["script"], {"id": ref["id"], "params": {"p0": "y"}})
+        self.assertEqual(cluster.scripts, {})
+
+    def test_user_scripts_stay(self):
+        # ONLY THE TRANSLATOR'S SCRIPTS ARE STORED
+        cluster = FakeCluster()
+        scripts = StoredScripts(cluster)
+        es_query = {
+            "query": {"bool": {"filter": [
+                {"script": {"script": 'doc["a"].value == "user"'}},
+                {"term": {"script": "setup.sh"}}
+            ]}}
+        }
+        output = unwrap(scripts.rewrite(es_query))
+        self.assertEqual(output, es_query)
+        self.assertEqual(cluster.scripts, {})
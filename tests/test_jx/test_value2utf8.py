@@ -0,0 +1,93 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import io
+import json
+
+from mo_dots import Data, FlatList, Null, wrap
+from mo_json import value2json, value2utf8
+from mo_json.encoder import UTF8_CHUNK_SIZE
+from mo_logs.strings import utf82unicode
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times import Date, Duration
+
+VALUES = [
+    None,
+    Null,
+    True,
+    0,
+    -12,
+    2 ** 40,
+    1.0,
+    0.1,
+    -2.5e-7,
+    1e20,
+    float("nan"),
+    float("inf"),
+    "",
+    "  ",
+    "text",
+    "quote\" and \\ and \n",
+    "é ☃ 😀",
+    Decimal("1.5"),
+    Date("2019-01-01"),
+    Duration("2hour"),
+    datetime(2019, 1, 1, 12),
+    timedelta(minutes=3),
+    [],
+    [1, None, "a", [2, []]],
+    (1, 2),
+    {},
+    {"a": None, "b": "  ", "c": 1, "d": {"e": [None]}},
+    Data(),
+    Data(a={"b": 1}, c=None),
+    FlatList([Data(a=1), Data(a=2)]),
+    wrap({"data": [{"a": 1, "b": "x"}, {"a": 2, "b": "x"}], "meta": {"format": "list"}})
+]
+
+
+class TestValue2Utf8(FuzzyTestCase):
+
+    def test_same_as_value2json(self):
+        for i, value in enumerate(VALUES):
+            expected = json.loads(value2json(value))
+            result = json.loads(utf82unicode(value2utf8(value)))
+            # EXACTLY EQUAL, NOT FUZZY; BIG NUMBERS MAY BE SHOWN WITH AN EXPONENT (SEE float2json()), BUT ARE THE SAME VALUE
+            self.assertTrue(result == expected, "for VALUES[" + str(i) + "]: " + value2json(result) + " != " + value2json(expected))
+
+    def test_all_at_once(self):
+        value = {"values": VALUES}
+        self.assertTrue(json.loads(utf82unicode(value2utf8(value))) == json.loads(value2json(value)))
+
+    def test_stream(self):
+        rows = FlatList([Data(i=i, name="row " + str(i), tags=["a", "é"]) for i in range(10000)])
+        value = Data(data=rows, meta={"format": "list"})
+        expected = value2utf8(value)
+        self.assertGreater(len(expected), UTF8_CHUNK_SIZE)
+
+        stream = Stream()
+        self.assertEqual(value2utf8(value, stream=stream), None)
+        self.assertEqual(b"".join(stream.chunks), expected)
+        self.assertGreater(len(stream.chunks), 1, "expecting the bytes to be written in chunks")
+
+
+class Stream(io.RawIOBase):
+
+    def __init__(self):
+        io.RawIOBase.__init__(self)
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+        return len(data)
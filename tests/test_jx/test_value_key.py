@@ -0,0 +1,104 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+import heapq
+
+from jx_base.language import value_compare, value_key
+from jx_python import jx
+from jx_python.containers.list_usingPythonList import ListContainer
+from mo_dots import unwrap
+from mo_future import sort_using_cmp
+from mo_testing.fuzzytestcase import FuzzyTestCase
+
+VALUES = [3, -1, 2.5, "b", "a", "", True, False, None, float("nan"), (1, 2), (1, "a"), {"a": 1}, {"a": 0}, 0, 2]
+
+
+class TestValueKey(FuzzyTestCase):
+
+    def test_same_order_as_value_compare(self):
+        for ordering in (1, -1):
+            for left in VALUES:
+                for right in VALUES:
+                    expected = value_compare(left, right, ordering)
+                    l, r = value_key(left, ordering), value_key(right, ordering)
+                    result = -1 if l < r else (1 if r < l else 0)
+                    self.assertEqual(
+                        result,
+                        expected,
+                        "compare " + repr(left) + " to " + repr(right) + " with ordering " + repr(ordering)
+                    )
+
+    def test_list_has_no_key(self):
+        self.assertEqual(value_key([1, 2]), None)
+
+    def test_sort(self):
+        rows = [{"a": a, "b": b, "i": i} for i, (a, b) in enumerate((a, b) for a in [2, None, 1, "x"] for b in [1, 0, None])]
+        for sort in [["a"], [{"value": "a", "sort": -1}, "b"], ["b", {"value": "a", "sort": -1}]]:
+            expected = unwrap(jx.sort(rows, sort))
+            for limit in [1, 2, len(rows), len(rows) + 5]:
+                self.assertEqual(
+                    [r["i"] for r in unwrap(jx.sort(rows, sort, limit=limit))],
+                    [r["i"] for r in expected[:limit]],
+                    "sort " + repr(sort) + " with limit " + repr(limit)
+                )
+
+    def test_sort_matches_compare(self):
+        rows = [{"a": v, "i": i} for i, v in enumerate(VALUES)]
+        for ordering in (1, -1):
+            expected = sort_using_cmp(list(rows), cmp=lambda l, r: value_compare(l["a"], r["a"], ordering))
+            result = jx.sort(rows, {"value": "a", "sort": ordering})
+            self.assertEqual([unwrap(r)["i"] for r in result], [r["i"] for r in expected])
+
+    def test_list_values(self):
+        # list VALUES HAVE NO KEY; value_compare() IS USED INSTEAD
+        rows = [{"a": [3, 1]}, {"a": 2}, {"a": [0]}, {"a": None}]
+        expected = sort_using_cmp(list(rows), cmp=lambda l, r: value_compare(l["a"], r["a"]))
+        self.assertEqual(unwrap(jx.sort(rows, "a")), expected)
+        self.assertEqual(unwrap(jx.sort(rows, "a", limit=2)), expected[:2])
+
+    def test_run_uses_top_k(self):
+        rows = [{"a": (i * 7919) % 1000, "i": i} for i in range(1000)]
+        expected = [r["i"] for r in unwrap(jx.sort(rows, "a"))[:5]]
+        calls = []
+        nsmallest = heapq.nsmallest
+
+        def counting_nsmallest(*args, **kwargs):
+            calls.append(1)
+            return nsmallest(*args, **kwargs)
+
+        heapq.nsmallest = counting_nsmallest
+        try:
+            result = jx.run({"from": ListContainer("t", rows), "sort": "a", "limit": 5})
+            self.assertEqual([r["i"] for r in unwrap(result.data)], expected)
+            self.assertTrue(calls, "expecting the partial sort to be used")
+
+            # window NEEDS EVERY ROW
+            del calls[:]
+            result = jx.run({
+                "from": ListContainer("t", rows),
+                "sort": "a",
+                "limit": 5,
+                "window": {"name": "n", "value": {"add": ["a", 1]}}
+            })
+            self.assertEqual(len(unwrap(result.data)), len(rows))
+            self.assertFalse(calls, "expecting a full sort when there is a window")
+        finally:
+            heapq.nsmallest = nsmallest
+
+    def test_run_without_limit_returns_all(self):
+        # THE DEFAULT limit DOES NOT TRUNCATE A SORTED IN-MEMORY QUERY, JUST AS IT DOES NOT TRUNCATE AN UNSORTED ONE
+        rows = [{"a": (i * 7) % 25} for i in range(25)]
+        for query in [{"sort": "a"}, {}]:
+            result = jx.run(dict(query, **{"from": ListContainer("t", rows)}))
+            self.assertEqual(len(unwrap(result.data)), 25)
+        result = jx.run({"from": ListContainer("t", rows), "sort": "a"})
+        self.assertEqual([r["a"] for r in unwrap(result.data)], list(range(25)))
@@ -0,0 +1,115 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from active_data.request_log import RequestLog
+from mo_dots import Data
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from mo_times.dates import Date
+
+
+class FakeWriter(object):
+
+    def __init__(self):
+        self.received = []
+
+    def extend(self, logs):
+        self.received.extend(l["value"] for l in logs)
+
+
+class FakeHeaders(dict):
+
+    def __init__(self, path):
+        dict.__init__(self, user_agent="test")
+        self.environ = {"werkzeug.request": Data(full_path=path)}
+
+
+def request(i):
+    return Data(headers=FakeHeaders("/query?" + str(i)), remote_addr="127.0.0.1")
+
+
+def record(i):
+    # WHAT RequestLog.add() STORES FOR request(i)
+    return Date.now(), "test", None, "/query?" + str(i), None, "127.0.0.1", None, None, None, None
+
+
+class TestRequestLog(FuzzyTestCase):
+
+    def setUp(self):
+        self.writer = FakeWriter()
+
+    def tearDown(self):
+        self.log.stop()
+
+    def _log(self, **kwargs):
+        # A LONG period, SO ONLY THE TEST CALLS _ship()
+        self.log = RequestLog(writer=self.writer, period=1000, **kwargs)
+        return self.log
+
+    def _shipped(self):
+        return [int(l.path.split("?")[1]) for l in self.writer.received]
+
+    def test_ship_in_order(self):
+        log = self._log(size=8)
+        for i in range(5):
+            log.add(request(i), None, None, None)
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 1, 2, 3, 4])
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 1, 2, 3, 4])
+        self.assertEqual(log.stats, {"shipped": 5, "dropped": 0, "sampled_out": 0, "failed": 0})
+
+    def test_writers_lap_reader(self):
+        log = self._log(size=4)
+        log.add(request(0), None, None, None)
+        log._ship()
+        for i in range(1, 11):
+            log.add(request(i), None, None, None)
+        # ONLY THE LAST size RECORDS ARE LEFT; THE OTHERS ARE COUNTED AS dropped
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 7, 8, 9, 10])
+        self.assertEqual(log.stats, {"shipped": 5, "dropped": 6})
+
+    def test_claimed_slot_not_stored(self):
+        log = self._log(size=4)
+        log.add(request(0), None, None, None)
+        log.add(request(1), None, None, None)
+        seq = next(log.next_seq)  # A SERVING THREAD HAS CLAIMED seq, BUT NOT STORED ITS RECORD
+        log.add(request(3), None, None, None)
+        log._ship()
+        # THE SHIPPER WAITS FOR seq, EVEN IF LATER RECORDS ARE READY
+        self.assertEqual(self._shipped(), [0, 1])
+        log.slots[seq % log.size] = (seq, record(2))
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 1, 2, 3])
+        self.assertEqual(log.stats, {"shipped": 4, "dropped": 0})
+
+    def test_claimed_slot_holds_last_lap(self):
+        log = self._log(size=2)
+        log.add(request(0), None, None, None)
+        log.add(request(1), None, None, None)
+        log._ship()
+        seq = next(log.next_seq)
+        # THE SLOT STILL HOLDS THE RECORD FROM THE LAST LAP; IT IS NOT SHIPPED AGAIN
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 1])
+        log.slots[seq % log.size] = (seq, record(2))
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 1, 2])
+        self.assertEqual(log.stats, {"shipped": 3, "dropped": 0})
+
+    def test_errors_not_sampled_out(self):
+        log = self._log(size=16, sample=0)
+        for i in range(10):
+            log.add(request(i), None, None, "error" if i % 3 == 0 else None)
+        log._ship()
+        self.assertEqual(self._shipped(), [0, 3, 6, 9])
+        self.assertEqual(log.stats, {"shipped": 4, "sampled_out": 6, "dropped": 0})
@@ -0,0 +1,55 @@
+# encoding: utf-8
+#
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+#
+# Author: Kyle Lahnakoski (kyle@lahnakoski.com)
+#
+
+from __future__ import absolute_import, division, unicode_literals
+
+from mo_json import value2json
+from mo_logs.strings import unicode2utf8
+from mo_testing.fuzzytestcase import FuzzyTestCase
+from pyLibrary.env.elasticsearch import stream_hits
+
+
+def reader(response):
+    """
+    :return: FUNCTION THAT RETURNS THE response BYTES, A FEW AT A TIME, LIKE A SOCKET
+    """
+    content = unicode2utf8(value2json(response))
+    chunks = [content[i:i + 7] for i in range(0, len(content), 7)]
+    chunks.reverse()
+
+    def read():
+        return chunks.pop() if chunks else b""
+    return read
+
+
+FAILED = {"total": 2, "failed": 1, "failures": [{"reason": "too many clauses"}]}
+
+
+class TestStreamHits(FuzzyTestCase):
+
+    def test_hits(self):
+        read = reader({"_shards": {"total": 2, "failed": 0}, "hits": {"hits": [{"_id": "a"}, {"_id": "b"}]}})
+        self.assertEqual([h._id for h in stream_hits(read, "hits.hits")], ["a", "b"])
+
+    def test_failures_with_hits(self):
+        read = reader({"_shards": FAILED, "hits": {"hits": [{"_id": "a"}]}})
+        self.assertRaises("Shard failures", list, stream_hits(read, "hits.hits"))
+
+    def test_failures_without_hits(self):
+        # A FAILED SHARD CAN BE THE REASON THERE ARE NO hits
+        read = reader({"_shards": FAILED, "hits": {"hits": []}})
+        self.assertRaises("Shard failures", list, stream_hits(read, "hits.hits"))
+
+        read = reader({"_shards": FAILED, "hits": {"total": 0}})
+        self.assertRaises("Shard failures", list, stream_hits(read, "hits.hits"))
+
+    def test_no_hits(self):
+        read = reader({"_shards": {"total": 2, "failed": 0}, "hits": {"hits": []}})
+        self.assertEqual(list(stream_hits(read, "hits.hits")), [])